@@ -0,0 +1,188 @@
+"""Benchmark the label render and print conversion hot path.
+
+Runs a fixed corpus through each stage and reports p50/p95/p99 latency and
+peak allocations per call. With --check the results are compared against
+benchmark_baseline.json and the script exits non-zero when a stage's median
+slows down by more than the tolerance. Medians hold up against the odd slow
+sample; compare against a baseline recorded on the same machine, ideally in
+the same session (CI benchmarks the base commit first).
+
+    python benchmark.py                 # report only
+    python benchmark.py --save          # store a new baseline
+    python benchmark.py --check         # fail if slower than the baseline
+    python benchmark.py --save --baseline base.json     # on the base commit
+    python benchmark.py --check --baseline base.json    # then on the change
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import main
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+BENCHMARK_PRINTER_MODEL = 'QL-820NWB'
+
+LONG_TASK = ("Call the supplier about the delayed shipment, update the tracking sheet, "
+             "and let the front desk know when the replacement parts are expected. ") * 4
+PARAGRAPH = " ".join(
+    ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit",
+     "sed", "do", "eiusmod", "tempor", "incididunt", "ut", "labore", "et",
+     "dolore", "magna", "aliqua", "enim"][i % 20] for i in range(1000)
+)
+
+# (name, task, label_title, label_description)
+CORPUS = [
+    ("empty_title", "Water the plants", "", ""),
+    ("short", "Buy milk", "To-Do", "Your task for today"),
+    ("long_task", LONG_TASK, "Errands", "Before Friday"),
+    ("paragraph_1000_words", PARAGRAPH, "Notes", "Meeting minutes"),
+    ("unbroken_word", "Pneumonoultramicroscopicsilicovolcanoconiosis" * 3, "Supercalifragilisticexpialidocious", "Antidisestablishmentarianism"),
+    ("unicode", "Réserver la salle — 会議室を予約する — Überprüfen ✓", "Tâches", "Ñandú café"),
+    ("application", "Submit the application", "Application application application review", "Application form"),
+]
+
+def stage_sizing(task, label_title, label_description):
+    # Cold sizing: every probe wraps the text again
+    main.wrap_cache.clear()
+    width = 696 - 2 * 60
+    main.find_optimal_font_size_with_wrap(label_title, 48, width)
+    main.find_optimal_font_size_with_wrap(label_description, 36, width)
+
+def stage_wrapping(task, label_title, label_description):
+    # Cold word and join tables, so this times the wrapper rather than lookups
+    font = main.get_font(42)
+    font.clear_measurements()
+    main.wrap_text(task, font, 696 - 2 * 60)
+
+def stage_layout(task, label_title, label_description):
+    # Bypasses layout_cache, field_cache and wrap_cache so every run does the
+    # full layout
+    main.field_cache.clear()
+    main.wrap_cache.clear()
+    return main.layout_label(task, label_title=label_title, label_description=label_description, layout_mode=main.LAYOUT_MODE)
+
+def stage_drawing(layout):
+    return main.draw_label(layout, render_mode=main.RENDER_MODE)
+
+def stage_render(task, label_title, label_description):
+    return stage_drawing(stage_layout(task, label_title, label_description))
+
+def stage_png(img):
+    main.encode_png(img)
+
+def stage_convert(img):
+    main.convert_labels([img], BENCHMARK_PRINTER_MODEL, main.CONVERT_ENGINE)
+
+STAGES = ['sizing', 'wrapping', 'layout', 'drawing', 'render', 'png', 'convert']
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def measure(fn, args, iterations):
+    """Time fn(*args) and record the peak traced allocation of one call"""
+    fn(*args)  # warm caches the way a running server would have them
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'peak_kib': peak / 1024,
+    }
+
+def run(iterations, stages):
+    results = {}
+    for name, task, label_title, label_description in CORPUS:
+        texts = (task, label_title, label_description)
+        layout = stage_layout(*texts)
+        img = stage_drawing(layout)
+        fns = {
+            'sizing': (stage_sizing, texts),
+            'wrapping': (stage_wrapping, texts),
+            'layout': (stage_layout, texts),
+            'drawing': (stage_drawing, (layout,)),
+            'render': (stage_render, texts),
+            'png': (stage_png, (img,)),
+            'convert': (stage_convert, (img,)),
+        }
+        for stage in stages:
+            fn, args = fns[stage]
+            results[f"{name}/{stage}"] = measure(fn, args, iterations)
+    return results
+
+def report(results, baseline=None):
+    print(f"{'case/stage':<36} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'vs base':>8}")
+    for key, r in results.items():
+        ratio = ''
+        if baseline and key in baseline:
+            ratio = f"{r['p50_ms'] / max(baseline[key]['p50_ms'], 1e-6):.2f}x"
+        print(f"{key:<36} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['peak_kib']:>10.1f} {ratio:>8}")
+
+def regressions(results, baseline, tolerance, floor_ms):
+    """Stages whose p50 grew by more than tolerance over the baseline"""
+    failed = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        limit = base['p50_ms'] * (1 + tolerance) + floor_ms
+        if r['p50_ms'] > limit:
+            failed.append(f"{key}: p50 {r['p50_ms']:.3f} ms > {limit:.3f} ms (baseline {base['p50_ms']:.3f} ms)")
+    return failed
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # Enough samples that p95 and p99 are not simply the slowest run
+    parser.add_argument('--iterations', type=int, default=100, help='timed runs per case and stage')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated stages to run')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline JSON file')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='exit 1 if any stage regressed')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed p50 slowdown as a fraction')
+    parser.add_argument('--floor-ms', type=float, default=0.5, help='absolute slack added to every limit')
+    args = parser.parse_args(argv)
+
+    stages = [s for s in args.stages.split(',') if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    results = run(args.iterations, stages)
+    report(results, baseline)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.check:
+        if baseline is None:
+            print(f"No baseline at {args.baseline}")
+            return 1
+        failed = regressions(results, baseline, args.tolerance, args.floor_ms)
+        for line in failed:
+            print(f"REGRESSION {line}")
+        return 1 if failed else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,30 @@
+"""Production server settings: gunicorn -c gunicorn.conf.py main:app
+
+Rendering is CPU-bound and holds the GIL, so throughput scales with worker
+processes rather than threads. The app (and with it the font registry) is
+loaded once in the master before forking, so workers share those pages
+copy-on-write.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# One process per core; a few threads each keep /jobs polling and streaming
+# /import responses from tying up a whole worker
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Load main.py (fonts included) before forking
+preload_app = True
+
+# Printing happens on the background print worker, so requests only render.
+# The timeout covers a cold render of very long labels; gthread workers keep
+# heartbeating while a long /import response is streaming.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
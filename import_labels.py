@@ -0,0 +1,56 @@
+"""Print every row of a CSV or JSON Lines to-do export.
+
+Rows are streamed through parse, render, convert and send, so memory stays
+flat however large the file is. CSV files need a header with a task column;
+label_title and label_description are optional. Progress goes to stderr and
+each failed row is reported with its line number.
+
+    python import_labels.py tasks.csv
+    python import_labels.py tasks.jsonl --engine numpy
+    cat tasks.csv | python import_labels.py - --format csv --dry-run
+"""
+import argparse
+import io
+import sys
+
+import main
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('file', help="CSV or JSON Lines file, or - for stdin")
+    parser.add_argument('--format', choices=main.IMPORT_FORMATS, help='input format (default: from the file extension)')
+    parser.add_argument('--engine', choices=main.CONVERT_ENGINES, help='raster conversion engine')
+    parser.add_argument('--printer-ip', help='override the configured printer IP')
+    parser.add_argument('--printer-model', help='override the configured printer model')
+    parser.add_argument('--dry-run', action='store_true', help='render and convert without printing')
+    args = parser.parse_args(argv)
+
+    settings = main.load_settings()
+    printer_ip = args.printer_ip or settings.get('printer_ip', '').strip()
+    printer_model = args.printer_model or settings.get('printer_model', '').strip()
+    if not printer_model or (not printer_ip and not args.dry_run):
+        parser.error("no printer configured; use /settings or pass --printer-ip and --printer-model")
+
+    fmt = args.format or main.detect_import_format(args.file)
+    if args.file == '-':
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace', newline='')
+    else:
+        stream = open(args.file, 'r', encoding='utf-8', errors='replace', newline='')
+
+    printed = failed = 0
+    with stream:
+        rows = main.parse_import_rows(stream, fmt)
+        for event in main.import_labels(rows, printer_ip, printer_model, args.engine, send=not args.dry_run):
+            if event['status'] == 'ok':
+                printed += 1
+            else:
+                failed += 1
+                print(f"line {event['row']}: {event['message']}", file=sys.stderr)
+            if (printed + failed) % main.IMPORT_CHUNK_SIZE == 0:
+                print(f"{printed + failed} rows processed ({failed} failed)", file=sys.stderr)
+
+    print(f"Done: {printed} {'converted' if args.dry_run else 'printed'}, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,591 @@
+"""Load-test the HTTP endpoints of a running label server.
+
+Simulated users send a weighted mix of page views (GET /), form submits
+(POST /, answered with a redirect), preview images (GET /label.png) and
+print requests (POST /print). Concurrency ramps up in steps. Each step
+reports requests/sec, latency percentiles and the error rate, plus the
+server's CPU and memory when --server-pid is given. The summary names the
+step where latency starts to degrade, and --json/--compare keep runs
+side by side, for example across server modes, worker counts or cache sizes.
+A 202 from POST /print only means the job was queued, so each print job is
+followed through /jobs/<id> to the end and its outcome reported per step.
+
+    python load_test.py                                     # 127.0.0.1:5000, 1..32 users
+    python load_test.py --server-pid "$(cat gunicorn.pid)"     # gunicorn --pid gunicorn.pid
+    python load_test.py --mix index=1,png=4 --unique 0.5    # half the labels uncached
+    python load_test.py --mix png=5,print=1 --emulator 9100 # printer IP 127.0.0.1:9100
+    python load_test.py --json before.json
+    python load_test.py --compare before.json
+"""
+import argparse
+import collections
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+# name -> (method, path, expected status)
+ACTIONS = {
+    'index': ('GET', '/', 200),
+    'submit': ('POST', '/', 302),
+    'png': ('GET', '/label.png', 200),
+    'layout': ('GET', '/label/layout', 200),
+    'print': ('POST', '/print', 202),
+}
+# POST /print is left out by default so a load test never prints on paper
+DEFAULT_MIX = 'index=3,submit=1,png=6'
+DEFAULT_CONCURRENCY = '1,2,4,8,16,32'
+# Longest wait for the server to see the emulator: one status interval and
+# some slack
+PRINTER_WAIT = 15.0
+# Print job states that are final
+JOB_FINAL_STATES = ('done', 'failed')
+
+TASKS = [
+    "Buy milk",
+    "Water the plants",
+    "Call the supplier about the delayed shipment and update the tracking sheet",
+    "Book the meeting room for Thursday",
+    "Renew the parking permit before the end of the month",
+    "Clean the coffee machine",
+    "Send the invoice to accounting",
+    "Réserver la salle — 会議室を予約する",
+    "Review the pull request for the label layout changes and leave comments on the font sizing",
+    "Submit the application",
+]
+# (label_title, label_description)
+HEADERS = [
+    ("To-Do", "Your task for today"),
+    ("Errands", "Before Friday"),
+    ("", ""),
+    ("Kitchen", ""),
+    ("Application application review", "Application form"),
+]
+
+# Marks this run's uncached labels so they miss caches warmed by earlier runs
+RUN_ID = uuid.uuid4().hex[:8]
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def parse_mix(text):
+    """'index=3,png=6' -> [('index', 3.0), ('png', 6.0)]"""
+    mix = []
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ACTIONS:
+            raise ValueError(f"unknown action {name!r}; use {', '.join(ACTIONS)}")
+        weight = float(weight) if weight.strip() else 1.0
+        if weight > 0:
+            mix.append((name, weight))
+    if not mix:
+        raise ValueError("the mix has no actions")
+    return mix
+
+def pick_label(rng, unique, counter):
+    """Form fields for one label; a fraction `unique` of them never repeats"""
+    task = rng.choice(TASKS)
+    label_title, label_description = rng.choice(HEADERS)
+    if unique and rng.random() < unique:
+        task = f"{task} #{RUN_ID}-{next(counter)}"
+    return {"task": task, "label_title": label_title, "label_description": label_description}
+
+class Client:
+    """One keep-alive connection, used by a single simulated user"""
+
+    def __init__(self, host, port, timeout):
+        self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, fields):
+        """Send a request and read the whole answer; returns (response, body)"""
+        query = urlencode(fields)
+        headers = {'Accept-Encoding': 'gzip'}
+        body = None
+        if method == 'GET':
+            path = f"{path}?{query}"
+        else:
+            body = query
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            self.conn.request(method, path, body, headers)
+            response = self.conn.getresponse()
+            return response, response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            raise
+
+    def close(self):
+        self.conn.close()
+
+def job_id_of(body):
+    try:
+        return json.loads(body).get('job_id')
+    except ValueError:
+        return None
+
+def user_loop(server, mix, deadline, seed, unique, counter, think, out, jobs):
+    """Send requests back to back until the deadline.
+
+    Appends (action, seconds, error) to out and the ids of queued print jobs
+    to jobs.
+    """
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    client = Client(*server)
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, expected = ACTIONS[name]
+        fields = pick_label(rng, unique, counter)
+        started = time.perf_counter()
+        try:
+            response, body = client.request(method, path, fields)
+            error = None if response.status == expected else str(response.status)
+            if name == 'print' and not error:
+                jobs.append(job_id_of(body))
+        except (OSError, http.client.HTTPException) as e:
+            error = type(e).__name__
+        out.append((name, time.perf_counter() - started, error))
+        if think:
+            time.sleep(think)
+    client.close()
+
+def run_step(server, users, duration, mix, unique, counter, think, seed):
+    """Run `users` concurrent users for `duration` seconds; returns (results, elapsed, print job ids)"""
+    deadline = time.perf_counter() + duration
+    results = [[] for _ in range(users)]
+    jobs = []
+    threads = [
+        threading.Thread(target=user_loop, args=(server, mix, deadline, seed * 1000 + i, unique, counter, think, results[i], jobs), daemon=True)
+        for i in range(users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # In-flight requests finish after the deadline, so time the whole step
+    elapsed = time.perf_counter() - started
+    return [sample for samples in results for sample in samples], elapsed, jobs
+
+def wait_for_jobs(server, job_ids, timeout):
+    """Poll /jobs/<id> until every job is done or failed; returns {id: (state, error)}.
+
+    Jobs still queued or printing at the timeout keep their last state, and
+    jobs the server doesn't know are 'unknown'.
+    """
+    outcomes = {job_id: ('unknown', None) for job_id in job_ids}
+    pending = [job_id for job_id in job_ids if job_id]
+    deadline = time.monotonic() + timeout
+    client = Client(*server)
+    try:
+        while pending:
+            still_pending = []
+            for job_id in pending:
+                try:
+                    response, body = client.request('GET', f'/jobs/{job_id}', {})
+                    job = json.loads(body) if response.status == 200 else {}
+                except (OSError, http.client.HTTPException, ValueError):
+                    job = {'state': 'queued'}  # ask again on the next round
+                state = job.get('state', 'unknown')
+                outcomes[job_id] = (state, job.get('error'))
+                if state not in JOB_FINAL_STATES and state != 'unknown':
+                    still_pending.append(job_id)
+            pending = still_pending
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(0.5)
+    finally:
+        client.close()
+    return outcomes
+
+def summarize_jobs(job_ids, outcomes):
+    """Outcome counts of one step's print jobs; anything not done counts as failed"""
+    states = collections.Counter(outcomes.get(job_id, ('unknown', None))[0] for job_id in job_ids)
+    errors = collections.Counter(
+        outcomes[job_id][1] or 'no error given' for job_id in job_ids
+        if outcomes.get(job_id, ('unknown', None))[0] == 'failed'
+    )
+    failed = len(job_ids) - states['done']
+    return {
+        'queued': len(job_ids),
+        'done': states['done'],
+        'failed': states['failed'],
+        'unfinished': failed - states['failed'],
+        'failure_rate': round(failed / len(job_ids), 4) if job_ids else 0.0,
+        'error_kinds': dict(errors),
+    }
+
+def summarize(samples, elapsed):
+    """Throughput, latency percentiles and errors of one step, overall and per action"""
+    def stats(rows):
+        latencies = [seconds for _, seconds, _ in rows]
+        errors = sum(1 for _, _, error in rows if error)
+        return {
+            'requests': len(rows),
+            'rps': round(len(rows) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4) if rows else 0.0,
+        }
+
+    by_action = collections.defaultdict(list)
+    for row in samples:
+        by_action[row[0]].append(row)
+    summary = stats(samples)
+    summary['elapsed_seconds'] = round(elapsed, 2)
+    summary['error_kinds'] = dict(collections.Counter(error for _, _, error in samples if error))
+    summary['actions'] = {name: stats(rows) for name, rows in sorted(by_action.items())}
+    return summary
+
+class ServerSampler:
+    """Samples CPU and memory of a server process and its descendants from /proc.
+
+    CPU is the share of one core, so it goes past 100% on several cores.
+    Memory is the proportional set size (pages shared by forked gunicorn
+    workers count once), or RSS where smaps_rollup can't be read.
+    """
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._ticks = os.sysconf('SC_CLK_TCK')
+        self._cpu = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._last = time.perf_counter()
+        self._cpu = self._cpu_times(self._process_tree())
+        self._thread = threading.Thread(target=self._run, name='server-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def _process_tree(self):
+        parents = collections.defaultdict(list)
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'r') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except (OSError, IndexError):
+                continue
+            parents[int(fields[1])].append(int(entry))
+        tree, pending = [], [self.pid]
+        while pending:
+            pid = pending.pop()
+            tree.append(pid)
+            pending.extend(parents.get(pid, ()))
+        return tree
+
+    def _cpu_times(self, pids):
+        times = {}
+        for pid in pids:
+            try:
+                with open(f'/proc/{pid}/stat', 'r') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except OSError:
+                continue
+            times[pid] = (int(fields[11]) + int(fields[12])) / self._ticks
+        return times
+
+    def _memory(self, pid):
+        for path, key in ((f'/proc/{pid}/smaps_rollup', 'Pss:'), (f'/proc/{pid}/status', 'VmRSS:')):
+            try:
+                with open(path, 'r') as f:
+                    for line in f:
+                        if line.startswith(key):
+                            return int(line.split()[1]) * 1024
+            except OSError:
+                continue
+        return 0
+
+    def sample(self):
+        now = time.perf_counter()
+        pids = self._process_tree()
+        cpu = self._cpu_times(pids)
+        # New worker processes start from zero CPU time
+        busy = sum(seconds - self._cpu.get(pid, 0.0) for pid, seconds in cpu.items())
+        wall = now - self._last
+        self._cpu, self._last = cpu, now
+        self.samples.append({
+            'time': now,
+            'cpu_percent': round(100.0 * busy / wall, 1) if wall else 0.0,
+            'memory_mib': round(sum(self._memory(pid) for pid in cpu) / (1 << 20), 1),
+            'processes': len(cpu),
+        })
+
+    def window(self, start, end):
+        """Mean CPU and peak memory of the samples taken between start and end"""
+        inside = [s for s in self.samples if start < s['time'] <= end]
+        if not inside:
+            return {'cpu_percent': None, 'memory_mib': None}
+        return {
+            'cpu_percent': round(sum(s['cpu_percent'] for s in inside) / len(inside), 1),
+            'memory_mib': max(s['memory_mib'] for s in inside),
+        }
+
+def find_knee(steps, factor, max_error_rate):
+    """First step whose p95 is more than `factor` times the first step's, or whose errors pass max_error_rate"""
+    if not steps:
+        return None
+    base = steps[0]['p95_ms']
+    for step in steps:
+        if step['p95_ms'] > base * factor or step['error_rate'] > max_error_rate:
+            return step
+    return None
+
+def format_optional(value, width, digits):
+    return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+def report_header():
+    print(f"{'users':>5} {'action':<8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'cpu %':>7} {'mem MiB':>8}")
+
+def report_step(step):
+    print(f"{step['users']:>5} {'all':<8} {step['rps']:>8.1f} {step['p50_ms']:>9.1f} {step['p95_ms']:>9.1f} "
+          f"{step['p99_ms']:>9.1f} {step['error_rate']:>7.1%} {format_optional(step['cpu_percent'], 7, 0)} "
+          f"{format_optional(step['memory_mib'], 8, 1)}")
+    for name, action in step['actions'].items():
+        print(f"{'':>5} {name:<8} {action['rps']:>8.1f} {action['p50_ms']:>9.1f} {action['p95_ms']:>9.1f} "
+              f"{action['p99_ms']:>9.1f} {action['error_rate']:>7.1%}")
+    if step['error_kinds']:
+        kinds = ', '.join(f"{kind} x{count}" for kind, count in sorted(step['error_kinds'].items()))
+        print(f"{'':>5} errors: {kinds}")
+    sys.stdout.flush()
+
+def report_summary(steps, knee, factor, max_error_rate):
+    peak = max(steps, key=lambda step: step['rps'])
+    print(f"Peak throughput {peak['rps']:.1f} req/s with {peak['users']} users")
+    if knee is None:
+        print(f"Latency held: p95 stayed within {factor:g}x of {steps[0]['p95_ms']:.1f} ms up to {steps[-1]['users']} users")
+    elif knee['error_rate'] > max_error_rate:
+        print(f"Errors pass {max_error_rate:.1%} at {knee['users']} users: {knee['error_rate']:.1%} of requests failed")
+    else:
+        print(f"Latency degrades at {knee['users']} users: p95 {knee['p95_ms']:.1f} ms vs "
+              f"{steps[0]['p95_ms']:.1f} ms with {steps[0]['users']}")
+
+def report_jobs(steps):
+    """Final state of the print jobs each step queued"""
+    print(f"{'users':>5} {'jobs':>8} {'done':>8} {'failed':>8} {'unfinished':>10} {'fail %':>7}")
+    for step in steps:
+        jobs = step['print_jobs']
+        print(f"{step['users']:>5} {jobs['queued']:>8} {jobs['done']:>8} {jobs['failed']:>8} "
+              f"{jobs['unfinished']:>10} {jobs['failure_rate']:>7.1%}")
+        if jobs['error_kinds']:
+            kinds = ', '.join(f"{kind} x{count}" for kind, count in sorted(jobs['error_kinds'].items()))
+            print(f"{'':>5} errors: {kinds}")
+    queued = sum(step['print_jobs']['queued'] for step in steps)
+    done = sum(step['print_jobs']['done'] for step in steps)
+    if queued:
+        print(f"{done} of {queued} queued print jobs printed; {queued - done} ({(queued - done) / queued:.1%}) failed or never finished")
+
+def report_comparison(steps, previous):
+    """req/s and p95 of this run against an earlier --json file, matched by user count"""
+    before = {step['users']: step for step in previous.get('steps', [])}
+    print(f"{'users':>5} {'req/s before':>13} {'now':>8} {'change':>7} {'p95 before':>11} {'now':>8} {'change':>7}")
+    for step in steps:
+        old = before.get(step['users'])
+        if old is None:
+            continue
+        rps_change = step['rps'] / old['rps'] if old['rps'] else 0.0
+        p95_change = step['p95_ms'] / old['p95_ms'] if old['p95_ms'] else 0.0
+        print(f"{step['users']:>5} {old['rps']:>13.1f} {step['rps']:>8.1f} {rps_change:>6.2f}x "
+              f"{old['p95_ms']:>11.1f} {step['p95_ms']:>8.1f} {p95_change:>6.2f}x")
+
+def check_server(server):
+    """None if the index page answers, otherwise why the test can't run"""
+    client = Client(*server)
+    try:
+        response, _ = client.request('GET', '/', {})
+    except (OSError, http.client.HTTPException) as e:
+        return f"Cannot reach {server[0]}:{server[1]}: {e}"
+    finally:
+        client.close()
+    if response.status in (301, 302) and '/settings' in (response.getheader('Location') or ''):
+        return "The printer is not configured, so every page redirects to /settings. Save a printer in /settings first."
+    if response.status != 200:
+        return f"GET / answered {response.status}"
+    return None
+
+def wait_for_printers(server, timeout):
+    """Wait until the server has a printer that takes jobs; False on timeout.
+
+    A printer the server probed before the emulator was listening stays
+    offline until its next probe, so ask for fresh status until it is seen.
+    """
+    host, port, request_timeout = server
+    deadline = time.monotonic() + timeout
+    while True:
+        conn = http.client.HTTPConnection(host, port, timeout=request_timeout)
+        try:
+            conn.request('GET', '/printer/status?refresh=1')
+            printers = json.loads(conn.getresponse().read()).get('printers', [])
+            if any(printer.get('accepting') for printer in printers):
+                return True
+        except (OSError, http.client.HTTPException, ValueError):
+            pass
+        finally:
+            conn.close()
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.5)
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='server to test')
+    parser.add_argument('--concurrency', default=DEFAULT_CONCURRENCY, help='comma-separated user counts, one step each')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per step')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unrecorded seconds before the first step')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"weighted actions out of {', '.join(ACTIONS)}")
+    parser.add_argument('--unique', type=float, default=0.1, help='fraction of requests for a label never seen before')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='pause between requests of one user')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--server-pid', type=int, help='sample CPU and memory of this process and its children')
+    parser.add_argument('--sample-interval', type=float, default=1.0, help='seconds between server samples')
+    parser.add_argument('--degrade-factor', type=float, default=2.0, help='p95 growth over the first step that counts as degraded')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='error rate that counts as degraded')
+    parser.add_argument('--emulator', type=int, metavar='PORT', help='run a printer emulator on this port for POST /print')
+    parser.add_argument('--emulator-speed', type=float, default=0.0, help='emulated print speed in mm/s (0 prints instantly)')
+    parser.add_argument('--job-timeout', type=float, default=60.0, help='seconds to wait for queued print jobs after the last step')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the request mix')
+    parser.add_argument('--json', help='write the steps and server samples to this file')
+    parser.add_argument('--compare', help='compare against a file written by --json')
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+        user_counts = [int(n) for n in args.concurrency.split(',') if n.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+    if not user_counts or min(user_counts) < 1:
+        parser.error("--concurrency needs positive user counts")
+    if args.server_pid and not os.path.exists(f'/proc/{args.server_pid}'):
+        parser.error(f"no process {args.server_pid} in /proc")
+
+    target = urlsplit(args.url)
+    if target.scheme != 'http' or not target.hostname:
+        parser.error("--url must be an http:// URL")
+    # (host, port, timeout) for every Client
+    server = (target.hostname, target.port or 80, args.timeout)
+
+    # Listen before the first request, which starts the server's printer
+    # status monitor
+    emulator = None
+    if args.emulator:
+        from printer_emulator import PrinterEmulator, format_stats
+        emulator = PrinterEmulator('127.0.0.1', args.emulator, speed=args.emulator_speed).start()
+    problem = check_server(server)
+    if problem:
+        print(problem, file=sys.stderr)
+        if emulator:
+            emulator.stop()
+        return 1
+    if emulator and 'print' in dict(mix) and not wait_for_printers(server, PRINTER_WAIT):
+        print(f"The server has no printer taking jobs; is its printer IP 127.0.0.1:{args.emulator}?", file=sys.stderr)
+    sampler = ServerSampler(args.server_pid, args.sample_interval).start() if args.server_pid else None
+
+    counter = iter(range(1 << 62))
+    think = args.think_ms / 1000.0
+    steps = []
+    # Print job ids of each step, the warmup's first
+    step_jobs = []
+    outcomes = {}
+    try:
+        if args.warmup:
+            step_jobs.append(run_step(server, user_counts[0], args.warmup, mix, args.unique, counter, think, args.seed)[2])
+        report_header()
+        for number, users in enumerate(user_counts, 1):
+            started = time.perf_counter()
+            samples, elapsed, jobs = run_step(server, users, args.duration, mix, args.unique, counter, think, args.seed + number)
+            step_jobs.append(jobs)
+            if sampler:
+                # Take a closing sample so short steps still get one
+                sampler.sample()
+            step = {'users': users, **summarize(samples, elapsed)}
+            step.update(sampler.window(started, time.perf_counter()) if sampler else {'cpu_percent': None, 'memory_mib': None})
+            steps.append(step)
+            report_step(step)
+        # Jobs still in the queue need the printer, so wait for them before
+        # the emulator stops
+        all_jobs = [job_id for jobs in step_jobs for job_id in jobs]
+        if all_jobs:
+            print(f"Waiting up to {args.job_timeout:g}s for {len(all_jobs)} print jobs to finish", file=sys.stderr)
+            deadline = time.monotonic() + args.job_timeout
+            outcomes = wait_for_jobs(server, all_jobs, args.job_timeout)
+            # A job is done once it is sent, which can be before it prints
+            while emulator and emulator.busy() and time.monotonic() < deadline:
+                time.sleep(0.1)
+            if emulator and emulator.busy():
+                print("The emulator was still printing when it stopped", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+    finally:
+        if sampler:
+            sampler.stop()
+        if emulator:
+            emulator.stop()
+
+    if not steps:
+        return 1
+    printing = 'print' in dict(mix)
+    if printing:
+        for step, jobs in zip(steps, step_jobs[-len(steps):]):
+            step['print_jobs'] = summarize_jobs(jobs, outcomes)
+        print()
+        report_jobs(steps)
+    knee = find_knee(steps, args.degrade_factor, args.max_error_rate)
+    print()
+    report_summary(steps, knee, args.degrade_factor, args.max_error_rate)
+    if emulator:
+        print(f"Emulator: {format_stats(emulator.stats())}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)
+        print()
+        report_comparison(steps, previous)
+
+    if args.json:
+        start = sampler.samples[0]['time'] if sampler and sampler.samples else 0.0
+        with open(args.json, 'w') as f:
+            json.dump({
+                'url': args.url,
+                'mix': dict(mix),
+                'unique': args.unique,
+                'duration': args.duration,
+                'steps': steps,
+                'degraded_at': knee['users'] if knee else None,
+                'server_samples': [
+                    {**s, 'time': round(s['time'] - start, 2)} for s in (sampler.samples if sampler else [])
+                ],
+            }, f, indent=2)
+        print(f"Saved results to {args.json}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -1,30 +1,85 @@
-from flask import Flask, render_template_string, request, send_file, jsonify, redirect
+from flask import Flask, Response, render_template, request, send_file, jsonify, redirect, stream_with_context
 from PIL import Image, ImageDraw, ImageFont
 import io
 from urllib.parse import urlencode
+from collections import OrderedDict
+import contextlib
+import copy
+import csv
+import gzip
+import hashlib
 import json
 import os
+import queue
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:  # optional; responses fall back to gzip
+    brotli = None
 
 app = Flask(__name__)
 
-# Settings file path
-SETTINGS_FILE = 'printer_settings.json'
+# Settings file path. Saves replace the file by renaming a temporary file
+# next to it, so in Docker mount its directory rather than the file itself.
+SETTINGS_FILE = os.environ.get('LABEL_SETTINGS_FILE', 'printer_settings.json')
+
+# Parsed settings are kept in memory and re-read only when the file changes
+SETTINGS_CHECK_INTERVAL = 1.0
+_settings_cache = None  # (file stamp, settings, time of last stat)
+_settings_lock = threading.Lock()
+
+def _settings_stamp(path):
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_ino, st.st_size)
 
 def load_settings():
-    """Load printer settings from file"""
-    if os.path.exists(SETTINGS_FILE):
-        try:
-            with open(SETTINGS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    if os.path.exists("/app/" +SETTINGS_FILE):
+    """Load printer settings, re-reading the file only when its mtime or inode changes"""
+    global _settings_cache
+    cached = _settings_cache
+    now = time.monotonic()
+    if cached is not None and now - cached[2] < SETTINGS_CHECK_INTERVAL:
+        return copy.deepcopy(cached[1])
+
+    for path in (SETTINGS_FILE, os.path.join("/app", SETTINGS_FILE)):
         try:
-            with open(SETTINGS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return {'printer_ip': '', 'printer_model': ''}
+            stamp = _settings_stamp(path)
+        except OSError:
+            continue
+        if cached is not None and cached[0] == stamp:
+            settings = cached[1]
+        else:
+            try:
+                with open(path, 'r') as f:
+                    settings = json.load(f)
+            except (OSError, ValueError):
+                if cached is not None and cached[0] is not None:
+                    # Most likely caught half-written by a save that couldn't
+                    # rename; keep the last good settings and read it again on
+                    # the next check
+                    with _settings_lock:
+                        _settings_cache = (cached[0], cached[1], now)
+                    return copy.deepcopy(cached[1])
+                continue
+        with _settings_lock:
+            _settings_cache = (stamp, settings, now)
+        return copy.deepcopy(settings)
+
+    settings = {'printer_ip': '', 'printer_model': ''}
+    with _settings_lock:
+        _settings_cache = (None, settings, now)
+    return copy.deepcopy(settings)
 
 def is_printer_configured():
     """Check if printer is properly configured"""
@@ -32,10 +87,30 @@ def is_printer_configured():
     return bool(settings.get('printer_ip', '').strip())
 
 def save_settings(settings):
-    """Save printer settings to file"""
+    """Save printer settings to file atomically"""
+    global _settings_cache
     try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings, f, indent=2)
+        directory = os.path.dirname(os.path.abspath(SETTINGS_FILE))
+        fd, tmp_path = tempfile.mkstemp(prefix='.printer_settings.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(settings, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            try:
+                os.replace(tmp_path, SETTINGS_FILE)
+            except OSError:
+                # A bind-mounted file can't be replaced by rename, so fall back
+                # to writing it in place; readers keep their last good copy
+                # if they catch it half-written
+                with open(SETTINGS_FILE, 'w') as f:
+                    json.dump(settings, f, indent=2)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        with _settings_lock:
+            _settings_cache = (_settings_stamp(SETTINGS_FILE), copy.deepcopy(settings), time.monotonic())
     except Exception as e:
         print(f"Error saving settings: {e}")
 
@@ -45,267 +120,7 @@ HTML = """
 <head>
   <meta charset="utf-8">
   <title>To-Do Label Printer</title>
-  <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-
-    * {
-      box-sizing: border-box;
-    }
-
-    body {
-      background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-      font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-      margin: 0;
-      padding: 0;
-      min-height: 100vh;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-    }
-
-    .container {
-      max-width: 600px;
-      width: 90%;
-      margin: 20px auto;
-      background: rgba(255, 255, 255, 0.95);
-      backdrop-filter: blur(10px);
-      border-radius: 20px;
-      box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-      padding: 40px 50px;
-      position: relative;
-      overflow: hidden;
-    }
-
-    .container::before {
-      content: '';
-      position: absolute;
-      top: 0;
-      left: 0;
-      right: 0;
-      height: 4px;
-      background: linear-gradient(90deg, #667eea, #764ba2);
-    }
-
-    .title {
-      font-size: 2.5em;
-      font-weight: 700;
-      background: linear-gradient(135deg, #667eea, #764ba2);
-      -webkit-background-clip: text;
-      -webkit-text-fill-color: transparent;
-      background-clip: text;
-      margin-bottom: 0.5em;
-      letter-spacing: -0.5px;
-      text-align: center;
-      line-height: 1.2;
-    }
-
-    .description {
-      font-size: 1.1em;
-      color: #6b7280;
-      margin-bottom: 2.5em;
-      line-height: 1.6;
-      text-align: center;
-      font-weight: 400;
-    }
-
-    form {
-      margin-bottom: 30px;
-    }
-
-    label {
-      display: block;
-      text-align: left;
-      margin-bottom: 8px;
-      color: #374151;
-      font-size: 0.95em;
-      font-weight: 600;
-      margin-left: 0;
-    }
-
-    input[type="text"], textarea {
-      width: 100%;
-      padding: 16px 20px;
-      font-size: 1em;
-      border: 2px solid #e5e7eb;
-      border-radius: 12px;
-      margin-bottom: 20px;
-      box-sizing: border-box;
-      transition: all 0.3s ease;
-      background: #fff;
-      font-family: inherit;
-    }
-
-    input[type="text"]:focus, textarea:focus {
-      outline: none;
-      border-color: #667eea;
-      box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-      transform: translateY(-1px);
-    }
-
-    textarea {
-      resize: vertical;
-      min-height: 80px;
-      max-height: 150px;
-      line-height: 1.5;
-    }
-
-    input[type="submit"] {
-      background: linear-gradient(135deg, #667eea, #764ba2);
-      color: #fff;
-      border: none;
-      padding: 16px 32px;
-      border-radius: 12px;
-      font-size: 1.1em;
-      font-weight: 600;
-      cursor: pointer;
-      transition: all 0.3s ease;
-      box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
-      margin-top: 10px;
-      width: 100%;
-    }
-
-    input[type="submit"]:hover {
-      transform: translateY(-2px);
-      box-shadow: 0 8px 25px rgba(102, 126, 234, 0.4);
-    }
-
-    input[type="submit"]:active {
-      transform: translateY(0);
-    }
-
-    .preview {
-      margin-top: 40px;
-      text-align: center;
-      padding: 30px;
-      background: rgba(255, 255, 255, 0.8);
-      border-radius: 16px;
-      box-shadow: inset 0 2px 4px rgba(0, 0, 0, 0.05);
-    }
-
-    .preview h3 {
-      color: #374151;
-      font-size: 1.5em;
-      margin-bottom: 20px;
-      font-weight: 600;
-    }
-
-    img {
-      border: 3px solid #e5e7eb;
-      border-radius: 16px;
-      box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
-      max-width: 100%;
-      background: #fff;
-      padding: 12px;
-      transition: transform 0.3s ease;
-    }
-
-    img:hover {
-      transform: scale(1.02);
-    }
-
-    .back-link {
-      display: inline-block;
-      margin-top: 30px;
-      color: #667eea;
-      text-decoration: none;
-      font-weight: 600;
-      transition: color 0.3s ease;
-    }
-
-    .back-link:hover {
-      color: #764ba2;
-      text-decoration: underline;
-    }
-
-    .confirmation {
-      text-align: center;
-      font-size: 1.2em;
-      color: #059669;
-      margin-top: 2em;
-      font-weight: 500;
-    }
-
-    /* Toast styles */
-    .toast {
-      position: fixed;
-      right: 30px;
-      bottom: 30px;
-      background: linear-gradient(135deg, #10b981, #059669);
-      color: #fff;
-      padding: 16px 24px;
-      border-radius: 12px;
-      box-shadow: 0 10px 30px rgba(16, 185, 129, 0.3);
-      opacity: 0;
-      transform: translateY(20px) scale(0.9);
-      transition: all 0.3s cubic-bezier(0.68, -0.55, 0.265, 1.55);
-      z-index: 9999;
-      pointer-events: none;
-      font-size: 1em;
-      font-weight: 500;
-      max-width: 300px;
-    }
-
-    .toast.show {
-      opacity: 1;
-      transform: translateY(0) scale(1);
-    }
-
-    .toast.error {
-      background: linear-gradient(135deg, #ef4444, #dc2626);
-      box-shadow: 0 10px 30px rgba(239, 68, 68, 0.3);
-    }
-
-    /* Responsive design */
-    @media (max-width: 768px) {
-      .container {
-        padding: 30px 25px;
-        margin: 10px;
-        width: calc(100% - 20px);
-      }
-
-      .title {
-        font-size: 2em;
-      }
-
-      .description {
-        font-size: 1em;
-      }
-
-      input[type="text"], textarea {
-        padding: 14px 16px;
-        font-size: 0.95em;
-      }
-
-      input[type="submit"] {
-        padding: 14px 24px;
-        font-size: 1em;
-      }
-
-      .preview {
-        padding: 20px;
-      }
-
-      .toast {
-        right: 15px;
-        bottom: 15px;
-        max-width: calc(100vw - 30px);
-      }
-    }
-
-    @media (max-width: 480px) {
-      .container {
-        padding: 20px 15px;
-      }
-
-      .title {
-        font-size: 1.8em;
-      }
-
-      input[type="submit"] {
-        font-size: 0.95em;
-      }
-    }
-  </style>
+  <link rel="stylesheet" href="{{ asset_url('index.css') }}">
 </head>
 <body>
   <div class="container">
@@ -322,89 +137,468 @@ HTML = """
       <textarea name="task" id="task" required placeholder="To-Do Item">{{ task|default('') }}</textarea>
       <input type="submit" value="Generate Label">
     </form>
-    {% if image_url %}
-      <div class="preview">
-        <h3>Preview:</h3>
-        <img src="{{ image_url }}" alt="Label Preview"/>
-        <form id="printForm" method="post" action="/print">
-          <input type="hidden" name="task" value="{{ task }}">
-          <input type="hidden" name="label_title" value="{{ label_title }}">
-          <input type="hidden" name="label_description" value="{{ label_description }}">
-          <input type="submit" value="Print Label">
-        </form>
-      </div>
-    {% endif %}
+    <div id="layoutInfo" class="layout-info" aria-live="polite"></div>
+    <div class="preview" id="preview"{% if not image_url %} hidden{% endif %}>
+      <h3>Preview:</h3>
+      <img id="previewImage" src="{{ image_url or '' }}" alt="Label Preview"/>
+      <form id="printForm" method="post" action="/print">
+        <input type="hidden" name="task" value="{{ task }}">
+        <input type="hidden" name="label_title" value="{{ label_title }}">
+        <input type="hidden" name="label_description" value="{{ label_description }}">
+        <input type="submit" value="Print Label">
+      </form>
+    </div>
   </div>
 
   <div id="toast" class="toast" role="status" aria-live="polite"></div>
 
-  <script>
-    (function() {
-      function showToast(message) {
-        const toast = document.getElementById('toast');
-        if (!toast) return;
-        toast.textContent = message || 'Done';
-        toast.classList.add('show');
-        setTimeout(() => toast.classList.remove('show'), 3000);
-      }
+  <script src="{{ asset_url('index.js') }}"></script>
+</body>
+</html>
+"""
 
-      function attachPrintHandler() {
-        const printForm = document.getElementById('printForm');
-        if (!printForm) return;
-        const submitBtn = printForm.querySelector('input[type="submit"]');
-
-        printForm.addEventListener('submit', async function(e) {
-          e.preventDefault();
-          if (submitBtn) {
-            submitBtn.disabled = true;
-            submitBtn.value = 'Printing...';
-          }
-          try {
-            const formData = new FormData(printForm);
-            const res = await fetch('/print', { method: 'POST', body: formData });
-            if (!res.ok) throw new Error('Request failed');
-            const data = await res.json().catch(() => ({}));
-            showToast((data && data.message) || 'Label sent to printer');
-
-            // Reset the main form fields and explicitly clear inputs
-            const mainForm = document.getElementById('mainForm');
-            if (mainForm) {
-              mainForm.reset(); // resets to initial values at page load
-              const titleEl = document.getElementById('label_title');
-              const descEl = document.getElementById('label_description');
-              const taskEl = document.getElementById('task');
-              if (titleEl) titleEl.value = '';
-              if (descEl) descEl.value = '';
-              if (taskEl) taskEl.value = '';
-            }
-            // Remove preview section
-            const preview = document.querySelector('.preview');
-            if (preview && preview.parentNode) {
-              preview.parentNode.removeChild(preview);
-            }
-            // Clear URL query parameters so refresh doesn't restore old values
-            window.history.replaceState(null, null, window.location.pathname);
-          } catch (err) {
-            console.error(err);
-            showToast('Failed to print label');
-          } finally {
-            if (submitBtn) {
-              submitBtn.disabled = false;
-              submitBtn.value = 'Print Label';
-            }
-          }
-        }, { once: true });
+INDEX_CSS = """
+@import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
+
+* {
+  box-sizing: border-box;
+}
+
+body {
+  background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+  font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+  margin: 0;
+  padding: 0;
+  min-height: 100vh;
+  display: flex;
+  align-items: center;
+  justify-content: center;
+}
+
+.container {
+  max-width: 600px;
+  width: 90%;
+  margin: 20px auto;
+  background: rgba(255, 255, 255, 0.95);
+  backdrop-filter: blur(10px);
+  border-radius: 20px;
+  box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
+  padding: 40px 50px;
+  position: relative;
+  overflow: hidden;
+}
+
+.container::before {
+  content: '';
+  position: absolute;
+  top: 0;
+  left: 0;
+  right: 0;
+  height: 4px;
+  background: linear-gradient(90deg, #667eea, #764ba2);
+}
+
+.title {
+  font-size: 2.5em;
+  font-weight: 700;
+  background: linear-gradient(135deg, #667eea, #764ba2);
+  -webkit-background-clip: text;
+  -webkit-text-fill-color: transparent;
+  background-clip: text;
+  margin-bottom: 0.5em;
+  letter-spacing: -0.5px;
+  text-align: center;
+  line-height: 1.2;
+}
+
+.description {
+  font-size: 1.1em;
+  color: #6b7280;
+  margin-bottom: 2.5em;
+  line-height: 1.6;
+  text-align: center;
+  font-weight: 400;
+}
+
+form {
+  margin-bottom: 30px;
+}
+
+label {
+  display: block;
+  text-align: left;
+  margin-bottom: 8px;
+  color: #374151;
+  font-size: 0.95em;
+  font-weight: 600;
+  margin-left: 0;
+}
+
+input[type="text"], textarea {
+  width: 100%;
+  padding: 16px 20px;
+  font-size: 1em;
+  border: 2px solid #e5e7eb;
+  border-radius: 12px;
+  margin-bottom: 20px;
+  box-sizing: border-box;
+  transition: all 0.3s ease;
+  background: #fff;
+  font-family: inherit;
+}
+
+input[type="text"]:focus, textarea:focus {
+  outline: none;
+  border-color: #667eea;
+  box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
+  transform: translateY(-1px);
+}
+
+textarea {
+  resize: vertical;
+  min-height: 80px;
+  max-height: 150px;
+  line-height: 1.5;
+}
+
+input[type="submit"] {
+  background: linear-gradient(135deg, #667eea, #764ba2);
+  color: #fff;
+  border: none;
+  padding: 16px 32px;
+  border-radius: 12px;
+  font-size: 1.1em;
+  font-weight: 600;
+  cursor: pointer;
+  transition: all 0.3s ease;
+  box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
+  margin-top: 10px;
+  width: 100%;
+}
+
+input[type="submit"]:hover {
+  transform: translateY(-2px);
+  box-shadow: 0 8px 25px rgba(102, 126, 234, 0.4);
+}
+
+input[type="submit"]:active {
+  transform: translateY(0);
+}
+
+.preview[hidden] {
+  display: none;
+}
+
+.preview {
+  margin-top: 40px;
+  text-align: center;
+  padding: 30px;
+  background: rgba(255, 255, 255, 0.8);
+  border-radius: 16px;
+  box-shadow: inset 0 2px 4px rgba(0, 0, 0, 0.05);
+}
+
+.preview h3 {
+  color: #374151;
+  font-size: 1.5em;
+  margin-bottom: 20px;
+  font-weight: 600;
+}
+
+img {
+  border: 3px solid #e5e7eb;
+  border-radius: 16px;
+  box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
+  max-width: 100%;
+  background: #fff;
+  padding: 12px;
+  transition: transform 0.3s ease;
+}
+
+img:hover {
+  transform: scale(1.02);
+}
+
+.back-link {
+  display: inline-block;
+  margin-top: 30px;
+  color: #667eea;
+  text-decoration: none;
+  font-weight: 600;
+  transition: color 0.3s ease;
+}
+
+.back-link:hover {
+  color: #764ba2;
+  text-decoration: underline;
+}
+
+.confirmation {
+  text-align: center;
+  font-size: 1.2em;
+  color: #059669;
+  margin-top: 2em;
+  font-weight: 500;
+}
+
+.layout-info {
+  min-height: 1.4em;
+  margin-top: 12px;
+  font-size: 0.9em;
+  color: #6b7280;
+  text-align: center;
+}
+
+/* Toast styles */
+.toast {
+  position: fixed;
+  right: 30px;
+  bottom: 30px;
+  background: linear-gradient(135deg, #10b981, #059669);
+  color: #fff;
+  padding: 16px 24px;
+  border-radius: 12px;
+  box-shadow: 0 10px 30px rgba(16, 185, 129, 0.3);
+  opacity: 0;
+  transform: translateY(20px) scale(0.9);
+  transition: all 0.3s cubic-bezier(0.68, -0.55, 0.265, 1.55);
+  z-index: 9999;
+  pointer-events: none;
+  font-size: 1em;
+  font-weight: 500;
+  max-width: 300px;
+}
+
+.toast.show {
+  opacity: 1;
+  transform: translateY(0) scale(1);
+}
+
+.toast.error {
+  background: linear-gradient(135deg, #ef4444, #dc2626);
+  box-shadow: 0 10px 30px rgba(239, 68, 68, 0.3);
+}
+
+/* Responsive design */
+@media (max-width: 768px) {
+  .container {
+    padding: 30px 25px;
+    margin: 10px;
+    width: calc(100% - 20px);
+  }
+
+  .title {
+    font-size: 2em;
+  }
+
+  .description {
+    font-size: 1em;
+  }
+
+  input[type="text"], textarea {
+    padding: 14px 16px;
+    font-size: 0.95em;
+  }
+
+  input[type="submit"] {
+    padding: 14px 24px;
+    font-size: 1em;
+  }
+
+  .preview {
+    padding: 20px;
+  }
+
+  .toast {
+    right: 15px;
+    bottom: 15px;
+    max-width: calc(100vw - 30px);
+  }
+}
+
+@media (max-width: 480px) {
+  .container {
+    padding: 20px 15px;
+  }
+
+  .title {
+    font-size: 1.8em;
+  }
+
+  input[type="submit"] {
+    font-size: 0.95em;
+  }
+}
+"""
+
+INDEX_JS = """
+(function() {
+  function showToast(message) {
+    const toast = document.getElementById('toast');
+    if (!toast) return;
+    toast.textContent = message || 'Done';
+    toast.classList.add('show');
+    setTimeout(() => toast.classList.remove('show'), 3000);
+  }
+
+  async function waitForJob(jobId) {
+    // Poll the print job until the worker finishes or gives up
+    for (let i = 0; i < 120; i++) {
+      await new Promise(resolve => setTimeout(resolve, 500));
+      const res = await fetch('/jobs/' + encodeURIComponent(jobId));
+      if (!res.ok) return;
+      const job = await res.json().catch(() => ({}));
+      if (job.state === 'done') {
+        showToast('Your label has been sent to the printer.');
+        return;
+      }
+      if (job.state === 'failed') {
+        showToast(job.error || 'Failed to print label');
+        return;
+      }
+    }
+  }
+
+  function attachPrintHandler() {
+    const printForm = document.getElementById('printForm');
+    if (!printForm) return;
+    const submitBtn = printForm.querySelector('input[type="submit"]');
+
+    printForm.addEventListener('submit', async function(e) {
+      e.preventDefault();
+      if (submitBtn) {
+        submitBtn.disabled = true;
+        submitBtn.value = 'Printing...';
+      }
+      try {
+        const formData = new FormData(printForm);
+        const res = await fetch('/print', { method: 'POST', body: formData });
+        const data = await res.json().catch(() => ({}));
+        if (!res.ok) throw new Error((data && data.message) || 'Failed to print label');
+        showToast((data && data.message) || 'Label sent to printer');
+        if (data && data.job_id) {
+          waitForJob(data.job_id).catch(err => console.error(err));
+        }
+
+        // Reset the main form fields and explicitly clear inputs
+        const mainForm = document.getElementById('mainForm');
+        if (mainForm) {
+          mainForm.reset(); // resets to initial values at page load
+          const titleEl = document.getElementById('label_title');
+          const descEl = document.getElementById('label_description');
+          const taskEl = document.getElementById('task');
+          if (titleEl) titleEl.value = '';
+          if (descEl) descEl.value = '';
+          if (taskEl) taskEl.value = '';
+        }
+        // Hide the preview until the next label is typed
+        const preview = document.getElementById('preview');
+        if (preview) preview.hidden = true;
+        const info = document.getElementById('layoutInfo');
+        if (info) info.textContent = '';
+        // Clear URL query parameters so refresh doesn't restore old values
+        window.history.replaceState(null, null, window.location.pathname);
+      } catch (err) {
+        console.error(err);
+        showToast(err.message || 'Failed to print label');
+      } finally {
+        if (submitBtn) {
+          submitBtn.disabled = false;
+          submitBtn.value = 'Print Label';
+        }
+      }
+    });
+  }
+
+  function attachLivePreview() {
+    // Refresh the preview image shortly after typing stops. The server
+    // caches each field's layout separately, so an edit only redoes the
+    // field that changed, and repeated text comes from the browser cache.
+    const mainForm = document.getElementById('mainForm');
+    const preview = document.getElementById('preview');
+    const image = document.getElementById('previewImage');
+    const printForm = document.getElementById('printForm');
+    if (!mainForm || !preview || !image || !printForm) return;
+    let timer = null;
+
+    function update() {
+      const values = {
+        task: document.getElementById('task').value,
+        label_title: document.getElementById('label_title').value,
+        label_description: document.getElementById('label_description').value
+      };
+      if (!values.task.trim()) {
+        preview.hidden = true;
+        return;
+      }
+      const params = new URLSearchParams(values).toString();
+      image.src = '/label.png?' + params;
+      for (const name in values) {
+        printForm.elements[name].value = values[name];
       }
+      preview.hidden = false;
+      // Keep the URL in step so a reload shows the same label
+      window.history.replaceState(null, null, '/?' + params);
+    }
 
-      if (document.readyState === 'loading') {
-        document.addEventListener('DOMContentLoaded', attachPrintHandler);
-      } else {
-        attachPrintHandler();
+    mainForm.addEventListener('input', function() {
+      clearTimeout(timer);
+      timer = setTimeout(update, 300);
+    });
+  }
+
+  function attachLayoutInfo() {
+    // Show line breaks and label length from /label/layout while typing
+    const mainForm = document.getElementById('mainForm');
+    const info = document.getElementById('layoutInfo');
+    if (!mainForm || !info) return;
+    let timer = null;
+    let controller = null;
+
+    async function update() {
+      const task = document.getElementById('task').value;
+      if (!task.trim()) {
+        info.textContent = '';
+        return;
       }
-    })();
-  </script>
-</body>
-</html>
+      const params = new URLSearchParams({
+        task: task,
+        label_title: document.getElementById('label_title').value,
+        label_description: document.getElementById('label_description').value
+      });
+      if (controller) controller.abort();
+      controller = new AbortController();
+      try {
+        const res = await fetch('/label/layout?' + params.toString(), { signal: controller.signal });
+        if (!res.ok) return;
+        const layout = await res.json();
+        const lines = layout.task.lines.length;
+        info.textContent = layout.length_mm + ' mm long · ' + lines + (lines === 1 ? ' task line' : ' task lines');
+        info.title = layout.task.lines.join('\\n');
+      } catch (err) {
+        if (err.name !== 'AbortError') console.error(err);
+      }
+    }
+
+    mainForm.addEventListener('input', function() {
+      clearTimeout(timer);
+      timer = setTimeout(update, 150);
+    });
+    update();
+  }
+
+  function init() {
+    attachPrintHandler();
+    attachLayoutInfo();
+    attachLivePreview();
+  }
+
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', init);
+  } else {
+    init();
+  }
+})();
 """
 
 SETTINGS_HTML = """
@@ -413,192 +607,7 @@ SETTINGS_HTML = """
 <head>
   <meta charset="utf-8">
   <title>Printer Settings - To-Do Label Printer</title>
-  <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-
-    * {
-      box-sizing: border-box;
-    }
-
-    body {
-      background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-      font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-      margin: 0;
-      padding: 0;
-      min-height: 100vh;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-    }
-
-    .container {
-      max-width: 500px;
-      width: 90%;
-      margin: 20px auto;
-      background: rgba(255, 255, 255, 0.95);
-      backdrop-filter: blur(10px);
-      border-radius: 20px;
-      box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-      padding: 40px 50px;
-      position: relative;
-      overflow: hidden;
-    }
-
-    .container::before {
-      content: '';
-      position: absolute;
-      top: 0;
-      left: 0;
-      right: 0;
-      height: 4px;
-      background: linear-gradient(90deg, #667eea, #764ba2);
-    }
-
-    .title {
-      font-size: 2.2em;
-      font-weight: 700;
-      background: linear-gradient(135deg, #667eea, #764ba2);
-      -webkit-background-clip: text;
-      -webkit-text-fill-color: transparent;
-      background-clip: text;
-      margin-bottom: 0.5em;
-      letter-spacing: -0.5px;
-      text-align: center;
-      line-height: 1.2;
-    }
-
-    .description {
-      font-size: 1em;
-      color: #6b7280;
-      margin-bottom: 2.5em;
-      line-height: 1.6;
-      text-align: center;
-      font-weight: 400;
-    }
-
-    form {
-      margin-bottom: 30px;
-    }
-
-    label {
-      display: block;
-      text-align: left;
-      margin-bottom: 8px;
-      color: #374151;
-      font-size: 0.95em;
-      font-weight: 600;
-      margin-left: 0;
-    }
-
-    input[type="text"] {
-      width: 100%;
-      padding: 16px 20px;
-      font-size: 1em;
-      border: 2px solid #e5e7eb;
-      border-radius: 12px;
-      margin-bottom: 20px;
-      box-sizing: border-box;
-      transition: all 0.3s ease;
-      background: #fff;
-      font-family: inherit;
-    }
-
-    input[type="text"]:focus {
-      outline: none;
-      border-color: #667eea;
-      box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-      transform: translateY(-1px);
-    }
-
-    input[type="submit"] {
-      background: linear-gradient(135deg, #667eea, #764ba2);
-      color: #fff;
-      border: none;
-      padding: 16px 32px;
-      border-radius: 12px;
-      font-size: 1.1em;
-      font-weight: 600;
-      cursor: pointer;
-      transition: all 0.3s ease;
-      box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
-      margin-top: 10px;
-      width: 100%;
-    }
-
-    input[type="submit"]:hover {
-      transform: translateY(-2px);
-      box-shadow: 0 8px 25px rgba(102, 126, 234, 0.4);
-    }
-
-    .back-link {
-      display: inline-block;
-      margin-top: 30px;
-      color: #667eea;
-      text-decoration: none;
-      font-weight: 600;
-      transition: color 0.3s ease;
-    }
-
-    .back-link:hover {
-      color: #764ba2;
-      text-decoration: underline;
-    }
-
-    .success {
-      text-align: center;
-      font-size: 1.1em;
-      color: #059669;
-      margin-top: 2em;
-      font-weight: 500;
-    }
-
-    .current-settings {
-      background: rgba(255, 255, 255, 0.8);
-      border-radius: 12px;
-      padding: 20px;
-      margin-bottom: 30px;
-      border: 1px solid #e5e7eb;
-    }
-
-    .current-settings h3 {
-      color: #374151;
-      margin-bottom: 15px;
-      font-size: 1.2em;
-    }
-
-    .setting-item {
-      display: flex;
-      justify-content: space-between;
-      margin-bottom: 8px;
-      font-size: 0.95em;
-    }
-
-    .setting-label {
-      font-weight: 600;
-      color: #6b7280;
-    }
-
-    .setting-value {
-      color: #374151;
-      font-family: monospace;
-      background: #f8fafc;
-      padding: 2px 6px;
-      border-radius: 4px;
-    }
-
-    /* Responsive design */
-    @media (max-width: 768px) {
-      .container {
-        padding: 30px 25px;
-        margin: 10px;
-        width: calc(100% - 20px);
-      }
-
-      .title {
-        font-size: 1.8em;
-      }
-    }
-  </style>
+  <link rel="stylesheet" href="{{ asset_url('settings.css') }}">
 </head>
 <body>
   <div class="container">
@@ -622,6 +631,12 @@ SETTINGS_HTML = """
           <span class="setting-label">Printer Model:</span>
           <span class="setting-value">{{ printer_model }}</span>
         </div>
+        {% if pool_size > 1 %}
+          <div class="setting-item">
+            <span class="setting-label">Printer Pool:</span>
+            <span class="setting-value">{{ pool_size }} printers, {{ printer_dispatch|replace('_', ' ') }}</span>
+          </div>
+        {% endif %}
       </div>
     {% endif %}
 
@@ -632,6 +647,16 @@ SETTINGS_HTML = """
       <label for="printer_model">Printer Model</label>
       <input type="text" name="printer_model" id="printer_model" value="{{ printer_model }}" placeholder="QL-810W" required>
 
+      <label for="printers">Additional Printers (one per line: IP model [media])</label>
+      <textarea name="printers" id="printers" placeholder="192.168.1.101 QL-820NWB 62">{{ printers }}</textarea>
+
+      <label for="printer_dispatch">Dispatch</label>
+      <select name="printer_dispatch" id="printer_dispatch">
+        {% for mode in dispatch_modes %}
+          <option value="{{ mode }}"{% if mode == printer_dispatch %} selected{% endif %}>{{ mode|replace('_', ' ')|capitalize }}</option>
+        {% endfor %}
+      </select>
+
       <input type="submit" value="Save Settings">
     </form>
 
@@ -649,73 +674,769 @@ SETTINGS_HTML = """
 </html>
 """
 
-def create_todo_image(
+SETTINGS_CSS = """
+@import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
+
+* {
+  box-sizing: border-box;
+}
+
+body {
+  background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+  font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+  margin: 0;
+  padding: 0;
+  min-height: 100vh;
+  display: flex;
+  align-items: center;
+  justify-content: center;
+}
+
+.container {
+  max-width: 500px;
+  width: 90%;
+  margin: 20px auto;
+  background: rgba(255, 255, 255, 0.95);
+  backdrop-filter: blur(10px);
+  border-radius: 20px;
+  box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
+  padding: 40px 50px;
+  position: relative;
+  overflow: hidden;
+}
+
+.container::before {
+  content: '';
+  position: absolute;
+  top: 0;
+  left: 0;
+  right: 0;
+  height: 4px;
+  background: linear-gradient(90deg, #667eea, #764ba2);
+}
+
+.title {
+  font-size: 2.2em;
+  font-weight: 700;
+  background: linear-gradient(135deg, #667eea, #764ba2);
+  -webkit-background-clip: text;
+  -webkit-text-fill-color: transparent;
+  background-clip: text;
+  margin-bottom: 0.5em;
+  letter-spacing: -0.5px;
+  text-align: center;
+  line-height: 1.2;
+}
+
+.description {
+  font-size: 1em;
+  color: #6b7280;
+  margin-bottom: 2.5em;
+  line-height: 1.6;
+  text-align: center;
+  font-weight: 400;
+}
+
+form {
+  margin-bottom: 30px;
+}
+
+label {
+  display: block;
+  text-align: left;
+  margin-bottom: 8px;
+  color: #374151;
+  font-size: 0.95em;
+  font-weight: 600;
+  margin-left: 0;
+}
+
+input[type="text"], textarea, select {
+  width: 100%;
+  padding: 16px 20px;
+  font-size: 1em;
+  border: 2px solid #e5e7eb;
+  border-radius: 12px;
+  margin-bottom: 20px;
+  box-sizing: border-box;
+  transition: all 0.3s ease;
+  background: #fff;
+  font-family: inherit;
+}
+
+textarea {
+  min-height: 90px;
+  resize: vertical;
+  font-family: monospace;
+}
+
+input[type="text"]:focus, textarea:focus, select:focus {
+  outline: none;
+  border-color: #667eea;
+  box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
+  transform: translateY(-1px);
+}
+
+input[type="submit"] {
+  background: linear-gradient(135deg, #667eea, #764ba2);
+  color: #fff;
+  border: none;
+  padding: 16px 32px;
+  border-radius: 12px;
+  font-size: 1.1em;
+  font-weight: 600;
+  cursor: pointer;
+  transition: all 0.3s ease;
+  box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
+  margin-top: 10px;
+  width: 100%;
+}
+
+input[type="submit"]:hover {
+  transform: translateY(-2px);
+  box-shadow: 0 8px 25px rgba(102, 126, 234, 0.4);
+}
+
+.back-link {
+  display: inline-block;
+  margin-top: 30px;
+  color: #667eea;
+  text-decoration: none;
+  font-weight: 600;
+  transition: color 0.3s ease;
+}
+
+.back-link:hover {
+  color: #764ba2;
+  text-decoration: underline;
+}
+
+.success {
+  text-align: center;
+  font-size: 1.1em;
+  color: #059669;
+  margin-top: 2em;
+  font-weight: 500;
+}
+
+.current-settings {
+  background: rgba(255, 255, 255, 0.8);
+  border-radius: 12px;
+  padding: 20px;
+  margin-bottom: 30px;
+  border: 1px solid #e5e7eb;
+}
+
+.current-settings h3 {
+  color: #374151;
+  margin-bottom: 15px;
+  font-size: 1.2em;
+}
+
+.setting-item {
+  display: flex;
+  justify-content: space-between;
+  margin-bottom: 8px;
+  font-size: 0.95em;
+}
+
+.setting-label {
+  font-weight: 600;
+  color: #6b7280;
+}
+
+.setting-value {
+  color: #374151;
+  font-family: monospace;
+  background: #f8fafc;
+  padding: 2px 6px;
+  border-radius: 4px;
+}
+
+/* Responsive design */
+@media (max-width: 768px) {
+  .container {
+    padding: 30px 25px;
+    margin: 10px;
+    width: calc(100% - 20px);
+  }
+
+  .title {
+    font-size: 1.8em;
+  }
+}
+"""
+
+# Static CSS and JS are served from content-fingerprinted URLs, so browsers
+# can keep them for a year and a changed file simply gets a new URL
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_MIMETYPES = {'.css': 'text/css', '.js': 'application/javascript'}
+
+# Text responses at least this large are compressed for clients that accept it
+COMPRESS_MIN_SIZE = 500
+COMPRESS_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'application/javascript', 'application/json')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def compress_body(data, encoding, level=None):
+    """Encode data as gzip or br"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+def preferred_encoding():
+    """Best Content-Encoding the current client accepts, or None"""
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+class StaticAsset:
+    """A CSS or JS file held in memory, pre-compressed at the highest levels"""
+    __slots__ = ('body', 'mimetype', 'etag', 'encoded')
+
+    def __init__(self, text, mimetype):
+        self.body = text.encode('utf-8')
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(self.body).hexdigest()
+        self.encoded = {'gzip': compress_body(self.body, 'gzip', 9)}
+        if brotli is not None:
+            self.encoded['br'] = compress_body(self.body, 'br', 11)
+
+static_assets = {}  # fingerprinted file name -> StaticAsset
+asset_urls = {}  # logical name -> fingerprinted URL
+
+def register_asset(name, text):
+    stem, ext = os.path.splitext(name)
+    asset = StaticAsset(text, ASSET_MIMETYPES[ext])
+    filename = f"{stem}.{asset.etag[:12]}{ext}"
+    static_assets[filename] = asset
+    asset_urls[name] = f"/assets/{filename}"
+
+def asset_url(name):
+    """URL of a registered asset, for use in templates"""
+    return asset_urls[name]
+
+register_asset('index.css', INDEX_CSS)
+register_asset('index.js', INDEX_JS)
+register_asset('settings.css', SETTINGS_CSS)
+app.jinja_env.globals['asset_url'] = asset_url
+
+# Page templates are compiled once instead of on every request
+INDEX_TEMPLATE = app.jinja_env.from_string(HTML)
+SETTINGS_TEMPLATE = app.jinja_env.from_string(SETTINGS_HTML)
+
+# Metrics exposed on /metrics in the Prometheus text format. Values are per
+# process, so each server worker reports its own.
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative-bucket histogram with one label dimension"""
+
+    def __init__(self, name, help_text, label, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v[0]), v[1], v[2]) for k, v in self._series.items())
+        for label_value, counts, count, total in items:
+            tag = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{tag},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{tag},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{tag}}} {total}')
+            lines.append(f'{self.name}_count{{{tag}}} {count}')
+        return lines
+
+class Counter:
+    """Monotonic counter with one optional label dimension"""
+
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, label_value=None):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items(), key=lambda item: str(item[0]))
+        for label_value, value in items:
+            if self.label is None:
+                lines.append(f"{self.name} {value}")
+            else:
+                lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+stage_seconds = Histogram('label_stage_seconds', 'Time spent in each label render and print stage.', 'stage')
+print_jobs_total = Counter('label_print_jobs_total', 'Finished print jobs by result.', 'result')
+labels_printed_total = Counter('label_labels_printed_total', 'Labels successfully sent to a printer.')
+printer_bytes_total = Counter('label_printer_bytes_sent_total', 'Raster instruction bytes sent to printers.')
+print_failovers_total = Counter('label_print_failovers_total', 'Jobs moved to another printer because one was unreachable.', 'printer')
+prerenders_total = Counter('label_prerenders_total', 'Label previews rendered ahead on form submit, by result.', 'result')
+
+def observe_stage(stage, start):
+    """Record the time since start for a stage and return the current time"""
+    now = time.perf_counter()
+    stage_seconds.observe(now - start, stage)
+    return now
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = stage_seconds.render()
+    for counter in (print_jobs_total, labels_printed_total, printer_bytes_total, print_failovers_total, prerenders_total):
+        lines.extend(counter.render())
+    lines.append("# HELP label_cache_requests_total Lookups in the in-process caches by result.")
+    lines.append("# TYPE label_cache_requests_total counter")
+    for name, cache in (('label_png', label_cache), ('raster', raster_cache), ('layout', layout_cache), ('field', field_cache), ('wrap', wrap_cache)):
+        lines.append(f'label_cache_requests_total{{cache="{name}",result="hit"}} {cache.hits}')
+        lines.append(f'label_cache_requests_total{{cache="{name}",result="miss"}} {cache.misses}')
+    lines.append("# HELP label_cache_bytes Bytes held by the in-process caches.")
+    lines.append("# TYPE label_cache_bytes gauge")
+    for name, cache in (('label_png', label_cache), ('raster', raster_cache), ('layout', layout_cache), ('field', field_cache)):
+        lines.append(f'label_cache_bytes{{cache="{name}"}} {cache.size}')
+    lines.append("# HELP label_font_cache_entries Fonts loaded in the font registry.")
+    lines.append("# TYPE label_font_cache_entries gauge")
+    lines.append(f"label_font_cache_entries {len(_font_cache)}")
+    return "\n".join(lines) + "\n"
+
+class LRUCache:
+    """Thread-safe LRU bounded by the total sizeof() of its values
+
+    sizeof defaults to len, which bounds a cache of bytes by memory.
+    """
+
+    def __init__(self, max_size, sizeof=len):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_size:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= self.sizeof(old)
+            self._items[key] = value
+            self.size += size
+            while self.size > self.max_size:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= self.sizeof(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        # A membership test doesn't count as a hit or a miss
+        with self._lock:
+            return key in self._items
+
+# Font registry shared by every render in the process
+FONT_PATH = "DejaVuSans-Bold.ttf"
+FONT_CACHE_SIZE = 128
+WARM_FONT_SIZES = range(12, 97)
+
+# Bound on the per-font word and join tables used by wrap_text
+FONT_MEASURE_CACHE_SIZE = 4096
+
+class CachedFont:
+    """A loaded font together with the metrics the layout code needs"""
+    __slots__ = ('font', 'ascent', 'descent', 'line_height', 'space_width', '_words', '_joins')
+
+    def __init__(self, font):
+        self.font = font
+        self.ascent, self.descent = font.getmetrics()
+        # Line height matches the 'Ay' bounding box used for layout
+        bbox = font.getbbox('Ay')
+        self.line_height = bbox[3] - bbox[1]
+        self.space_width = font.getlength(' ')
+        self._words = {}
+        self._joins = {}
+
+    def clear_measurements(self):
+        """Forget the measured words and joins"""
+        self._words.clear()
+        self._joins.clear()
+
+    def measure_word(self, word):
+        """Return (advance, ink left, ink right) for a single word"""
+        m = self._words.get(word)
+        if m is None:
+            bbox = self.font.getbbox(word)
+            m = (self.font.getlength(word), bbox[0], bbox[2])
+            if len(self._words) >= FONT_MEASURE_CACHE_SIZE:
+                self._words.clear()
+            self._words[word] = m
+        return m
+
+    def line_width(self, line):
+        """Ink width of a rendered line"""
+        bbox = self.font.getbbox(line)
+        return bbox[2] - bbox[0]
+
+    def join_advance(self, left, right):
+        """Advance of the space between two words, including kerning around it"""
+        pair = left + right
+        adv = self._joins.get(pair)
+        if adv is None:
+            adv = (self.font.getlength(left + ' ' + right)
+                   - self.font.getlength(left) - self.font.getlength(right))
+            if len(self._joins) >= FONT_MEASURE_CACHE_SIZE:
+                self._joins.clear()
+            self._joins[pair] = adv
+        return adv
+
+_font_cache = OrderedDict()
+_font_cache_lock = threading.Lock()
+
+def get_font(size, font_path=FONT_PATH, layout_engine=None):
+    """Return the cached font for (path, size, layout engine), loading it once"""
+    key = (font_path, size, layout_engine)
+    with _font_cache_lock:
+        entry = _font_cache.get(key)
+        if entry is not None:
+            _font_cache.move_to_end(key)
+            return entry
+
+    # Parse outside the lock so a cold size doesn't block other renders
+    entry = CachedFont(ImageFont.truetype(font_path, size, layout_engine=layout_engine))
+
+    with _font_cache_lock:
+        existing = _font_cache.get(key)
+        if existing is not None:
+            _font_cache.move_to_end(key)
+            return existing
+        _font_cache[key] = entry
+        while len(_font_cache) > FONT_CACHE_SIZE:
+            _font_cache.popitem(last=False)
+    return entry
+
+def warm_font_cache(font_path=FONT_PATH, sizes=WARM_FONT_SIZES):
+    """Preload the font sizes the label layout can pick"""
+    try:
+        for size in sizes:
+            get_font(size, font_path)
+    except OSError as e:
+        print(f"Error warming font cache: {e}")
+
+# Render modes: "rgb" draws the full-color preview look, "palette" draws
+# directly into a 3-entry white/black/red palette matching QL two-color media
+RENDER_MODE = os.environ.get('LABEL_RENDER_MODE', 'rgb')
+PALETTE_WHITE, PALETTE_BLACK, PALETTE_RED = 0, 1, 2
+LABEL_PALETTE = [255, 255, 255, 0, 0, 0, 255, 0, 0]
+
+# Slack (in pixels) around the summed-advance estimate inside which
+# wrap_text falls back to measuring the real line
+WRAP_TOLERANCE = 2
+
+def wrap_text(text, font, max_width):
+    """Greedily wrap text into lines no wider than max_width.
+
+    Each word is measured once and line widths are built up from cached
+    advances, so wrapping is linear in the length of the text. Only words that
+    land within WRAP_TOLERANCE of the limit are checked against the real
+    bounding box, which keeps the breaks identical to measuring every line.
+    """
+    if not text:
+        return []
+
+    lines = []
+    line = []
+    line_left = 0  # ink offset of the first word
+    x = 0.0  # pen position after the last word on the line
+    for word in text.split():
+        advance, left, right = font.measure_word(word)
+        if not line:
+            line = [word]
+            line_left = left
+            x = advance
+            continue
+
+        start = x + font.join_advance(line[-1][-1], word[0])
+        estimate = start + right - line_left
+        if estimate <= max_width - WRAP_TOLERANCE:
+            fits = True
+        elif estimate > max_width + WRAP_TOLERANCE:
+            fits = False
+        else:
+            bbox = font.font.getbbox(' '.join(line) + ' ' + word)
+            fits = bbox[2] - bbox[0] <= max_width
+
+        if fits:
+            line.append(word)
+            x = start + advance
+        else:
+            # A word wider than max_width still gets a line of its own
+            lines.append(' '.join(line))
+            line = [word]
+            line_left = left
+            x = advance
+
+    if line:
+        lines.append(' '.join(line))
+    return lines
+
+# Wrapped lines keyed by (font path, size, width, text), bounded by the number
+# of characters they hold. Shared by sizing probes, layouts and requests.
+WRAP_CACHE_MAX_CHARS = 4 * 1024 * 1024
+wrap_cache = LRUCache(WRAP_CACHE_MAX_CHARS, sizeof=lambda lines: sum(map(len, lines)) + 1)
+
+def wrap_lines(text, size, max_width, font_path=FONT_PATH):
+    """wrap_text at a font size, memoized in wrap_cache.
+
+    The returned list is shared, so treat it as read-only.
+    """
+    key = (font_path, size, max_width, text)
+    lines = wrap_cache.get(key)
+    if lines is None:
+        lines = wrap_text(text, get_font(size, font_path), max_width)
+        wrap_cache.put(key, lines)
+    return lines
+
+# Most lines the title and description may wrap onto at the fitted size
+MAX_FIT_LINES = 3
+
+def find_optimal_font_size(text, base_size, max_width, font_path=FONT_PATH):
+    """Largest size from half to double base_size that fits text on one line"""
+    lo, hi = int(base_size * 0.5), int(base_size * 2.0)
+    if not text:
+        return base_size
+
+    # Bisect on the single-point size; width only grows with size
+    best = lo
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if get_font(mid, font_path).line_width(text) <= max_width:
+            best = mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+def find_optimal_font_size_with_wrap(text, base_size, max_width, font_path=FONT_PATH, max_lines=MAX_FIT_LINES):
+    """Find the largest size that wraps text into max_lines within max_width.
+
+    Sizes from base_size // 2 to 2 * base_size are bisected at single-point
+    resolution. Returns (size, lines) so the caller can reuse the wrap of the
+    chosen size; base_size is used when nothing in the range fits.
+    """
+    if not text:
+        return base_size, []
+
+    def fits(size):
+        font = get_font(size, font_path)
+        # A word wider than the label can never fit, whatever the wrap
+        for word in text.split():
+            advance, left, right = font.measure_word(word)
+            if right - left > max_width + WRAP_TOLERANCE:
+                return False
+        lines = wrap_lines(text, size, max_width, font_path)
+        if len(lines) > max_lines:
+            return False
+        return all(font.line_width(line) <= max_width for line in lines)
+
+    lo, hi = base_size // 2, base_size * 2
+    # Short text usually fits at the largest size, so try that first
+    if fits(hi):
+        return hi, wrap_lines(text, hi, max_width, font_path)
+
+    best = None
+    hi -= 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            best = mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+
+    if best is None:
+        best = base_size
+    return best, wrap_lines(text, best, max_width, font_path)
+
+def list_nbytes(items):
+    """Memory held by a list and its items, for bounding caches by bytes"""
+    return sys.getsizeof(items) + sum(sys.getsizeof(item) for item in items)
+
+class TextBlock:
+    """Wrapped lines of one label field and where each line is drawn"""
+    __slots__ = ('font_size', 'line_height', 'lines', 'x', 'ys')
+
+    def __init__(self, font_size, line_height, lines, x, y):
+        self.font_size = font_size
+        self.line_height = line_height
+        self.lines = lines
+        self.x = x
+        self.ys = [y + i * line_height for i in range(len(lines))]
+
+    @property
+    def height(self):
+        return self.line_height * len(self.lines)
+
+    @property
+    def nbytes(self):
+        return sys.getsizeof(self) + list_nbytes(self.lines) + list_nbytes(self.ys)
+
+    def to_dict(self):
+        return {
+            "font_size": self.font_size,
+            "line_height": self.line_height,
+            "lines": list(self.lines),
+            "x": self.x,
+            "ys": list(self.ys)
+        }
+
+class LabelLayout:
+    """Everything needed to draw a label: size, frame and text blocks.
+
+    Built by layout_label without touching any pixels. Layouts are shared
+    through layout_cache, so treat them as read-only.
+    """
+    __slots__ = ('width', 'height', 'font_path', 'rect', 'title', 'description', 'task')
+
+    def __init__(self, width, height, font_path, rect, title, description, task):
+        self.width = width
+        self.height = height
+        self.font_path = font_path
+        self.rect = rect
+        self.title = title
+        self.description = description
+        self.task = task
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the layout and its text blocks"""
+        blocks = [block for block in (self.title, self.description, self.task) if block is not None]
+        return sys.getsizeof(self) + sys.getsizeof(self.rect) + sum(block.nbytes for block in blocks)
+
+    def to_dict(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "length_mm": round(self.height / LABEL_DPI * 25.4, 1),
+            "rect": list(self.rect),
+            "title": self.title.to_dict() if self.title else None,
+            "description": self.description.to_dict() if self.description else None,
+            "task": self.task.to_dict()
+        }
+
+# Resolution the label is laid out at, used to report its printed length
+LABEL_DPI = 300
+
+# Sized and wrapped fields, keyed by a hash of the field's own text and
+# bounded by the memory their (size, lines) values hold. The lines are shared
+# with wrap_cache, so this overcounts rather than undercounts.
+FIELD_CACHE_MAX_BYTES = 4 * 1024 * 1024
+field_cache = LRUCache(FIELD_CACHE_MAX_BYTES, sizeof=lambda field: sys.getsizeof(field) + list_nbytes(field[1]))
+
+def field_key(*parts):
+    """Hash identifying one field's sizing inputs"""
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+def fit_field(text, base_size, max_width, font_path=FONT_PATH):
+    """find_optimal_font_size_with_wrap, memoized in field_cache"""
+    key = field_key('fit', text, base_size, max_width, font_path)
+    field = field_cache.get(key)
+    if field is None:
+        started = time.perf_counter()
+        field = find_optimal_font_size_with_wrap(text, base_size, max_width, font_path)
+        observe_stage('sizing', started)
+        field_cache.put(key, field)
+    return field
+
+def layout_task_field(text, wrap_size, max_width, font_path=FONT_PATH):
+    """Wrap the task text and pick its font size, memoized in field_cache"""
+    key = field_key('task', text, wrap_size, max_width, font_path)
+    field = field_cache.get(key)
+    if field is not None:
+        return field
+
+    # Wrap task text
+    started = time.perf_counter()
+    task_lines = wrap_lines(text, wrap_size, max_width, font_path)
+    started = observe_stage('wrapping', started)
+
+    # Task font size (already handles wrapping)
+    task_font_size = 36
+    temp_task_font = get_font(task_font_size, font_path)
+    max_task_width = 0
+    for line in task_lines:
+        max_task_width = max(max_task_width, temp_task_font.line_width(line))
+
+    if max_task_width > max_width:
+        task_font_size = find_optimal_font_size("Sample task text", 36, max_width, font_path)
+    observe_stage('sizing', started)
+
+    field = (task_font_size, task_lines)
+    field_cache.put(key, field)
+    return field
+
+def layout_label(
     text,
     width=696,
-    font_path="DejaVuSans-Bold.ttf",
+    font_path=FONT_PATH,
     font_size=42,
     padding=60,
-    bg_color="#f8f9fa",
-    item_color="#ffffff",
-    border_color="#ff0000",
-    text_color="#000000",
     label_title="To-Do",
-    label_description="Your task for today"
+    label_description="Your task for today",
+    layout_mode="standard"
 ):
+    """Size fonts, wrap every field and place each line of a label"""
+    if layout_mode == "compact":
+        return layout_compact_label(text, width, font_path, label_title, label_description)
+
     # Calculate title and description presence
     has_title = bool(label_title.strip()) if label_title is not None else False
     has_desc = bool(label_description.strip()) if label_description is not None else False
     # Calculate max text width
     max_text_width = width - 2 * padding
 
-    # Function to wrap text into multiple lines
-    def wrap_text(text, font, max_width):
-        if not text:
-            return []
-    
-        words = text.split()
-        lines = []
-        word_iterations = 0
-    
-        while words:
-            line = ''
-            inner_iterations = 0
-            while words:
-                inner_iterations += 1
-                word_iterations += 1
-    
-                # Safety check to prevent infinite loops
-                if word_iterations > 1000:
-                    lines.append(text[:50] + "..." if len(text) > 50 else text)
-                    return lines
-    
-                test_line = f"{line} {words[0]}".strip()
-    
-                try:
-                    bbox = font.getbbox(test_line)
-                    w = bbox[2] - bbox[0]
-    
-                    if w <= max_width:
-                        line = test_line
-                        words.pop(0)
-                    else:
-                        break
-                except Exception as e:
-                    break
-    
-            if line:
-                lines.append(line)
-            else:
-                # If we can't fit even the first word, add it anyway
-                if words:
-                    lines.append(words.pop(0))
-    
-        return lines
-
-    # Wrap task text
-    temp_font = ImageFont.truetype(font_path, font_size)
-    task_lines = wrap_text(text, temp_font, max_text_width)
-
     # Ensure minimum height of 2 inches (600 pixels at 300 DPI)
     min_height = 600
     img_height = max(min_height, 600)  # Start with minimum height
@@ -724,102 +1445,31 @@ def create_todo_image(
     max_title_height = min(300, (img_height - 2 * padding) // 2)  # Max 1 inch or half the label
     min_title_height = 60  # Minimum reasonable title space
 
-    # Calculate content requirements including width constraints
-    has_title = bool(label_title.strip()) if label_title is not None else False
-    has_desc = bool(label_description.strip()) if label_description is not None else False
-
-
     # Available width for text
     available_text_width = width - 2 * padding
 
-    # Test different font sizes to find optimal scaling
-    def find_optimal_font_size(text, base_size, max_width):
-        if not text:
-            return base_size
-
-        # Try different scale factors
-        for scale in [2.0, 1.5, 1.2, 1.0, 0.9, 0.8, 0.7, 0.6, 0.5]:
-            test_size = int(base_size * scale)
-            test_font = ImageFont.truetype(font_path, test_size)
-            bbox = test_font.getbbox(text)
-            text_width = bbox[2] - bbox[0]
-            if text_width <= max_width:
-                return test_size
-
-        return int(base_size * 0.5)  # Minimum fallback
-
-    # Find optimal font sizes for each text element with word wrapping
-    def find_optimal_font_size_with_wrap(text, base_size, max_width):
-        if not text:
-            return base_size
-    
-        # Try different font sizes, using word wrapping to check if text fits
-        start_size = base_size * 2
-        end_size = base_size // 2
-        step = -4  # Larger step to reduce iterations
-    
-        iteration_count = 0
-    
-        for test_size in range(start_size, end_size, step):  # From large to small
-            iteration_count += 1
-    
-            # Safety check to prevent too many iterations
-            if iteration_count > 10:  # Reduced from 20
-                return base_size
-    
-            try:
-                test_font = ImageFont.truetype(font_path, test_size)
-                wrapped_lines = wrap_text(text, test_font, max_width)
-    
-                line_height = test_font.getbbox('Ay')[3] - test_font.getbbox('Ay')[1]
-                total_height = line_height * len(wrapped_lines)
-    
-                # Check if it fits in reasonable space (not too many lines)
-                if len(wrapped_lines) <= 3:  # Allow up to 3 lines
-                    return test_size
-    
-            except Exception as e:
-                continue
-    
-        return base_size  # Use base size instead of half size
-
-    title_font_size = find_optimal_font_size_with_wrap(label_title, 48, available_text_width) if has_title else 0
-    desc_font_size = find_optimal_font_size_with_wrap(label_description, 36, available_text_width) if has_desc else 0
+    # Each field is sized and wrapped on its own and cached under its own
+    # text, so editing one field leaves the others' work in field_cache
+    task_font_size, task_lines = layout_task_field(text, font_size, max_text_width, font_path)
+    title_font_size, title_lines = fit_field(label_title, 48, available_text_width, font_path) if has_title else (0, [])
+    desc_font_size, desc_lines = fit_field(label_description, 36, available_text_width, font_path) if has_desc else (0, [])
+    started = time.perf_counter()
 
-    # Task font size (already handles wrapping)
-    task_font_size = 36
-    temp_task_font = ImageFont.truetype(font_path, task_font_size)
-    max_task_width = 0
-    for line in task_lines:
-        bbox = temp_task_font.getbbox(line)
-        line_width = bbox[2] - bbox[0]
-        max_task_width = max(max_task_width, line_width)
-
-    if max_task_width > available_text_width:
-        task_font_size = find_optimal_font_size("Sample task text", 36, available_text_width)
-
-    # Create fonts with optimal sizes
-    font_title = ImageFont.truetype(font_path, title_font_size) if has_title else None
-    font_desc = ImageFont.truetype(font_path, desc_font_size) if has_desc else None
-    font_task = ImageFont.truetype(font_path, task_font_size)
-
-    # Wrap text with final fonts
-    title_lines = wrap_text(label_title, font_title, available_text_width) if has_title else []
-    desc_lines = wrap_text(label_description, font_desc, available_text_width) if has_desc else []
+    # Fonts at their optimal sizes
+    title_entry = get_font(title_font_size, font_path) if has_title else None
+    desc_entry = get_font(desc_font_size, font_path) if has_desc else None
+    task_entry = get_font(task_font_size, font_path)
 
     # Calculate actual heights with scaled fonts and wrapped text
     title_height = 0
     if has_title and title_lines:
-        line_height = font_title.getbbox('Ay')[3] - font_title.getbbox('Ay')[1]
-        title_height = line_height * len(title_lines)
+        title_height = title_entry.line_height * len(title_lines)
 
     desc_height = 0
     if has_desc and desc_lines:
-        line_height = font_desc.getbbox('Ay')[3] - font_desc.getbbox('Ay')[1]
-        desc_height = line_height * len(desc_lines)
+        desc_height = desc_entry.line_height * len(desc_lines)
 
-    line_height = font_task.getbbox('Ay')[3] - font_task.getbbox('Ay')[1]
-    task_height = line_height * len(task_lines)
+    task_height = task_entry.line_height * len(task_lines)
 
     # Dynamic space allocation
     total_available_height = img_height - 2 * padding
@@ -861,25 +1511,246 @@ def create_todo_image(
 
     # Final area assignments
     title_area_height = actual_title_height
-    content_area_height = remaining_height
 
-    # Create image with subtle gradient background
-    img = Image.new("RGB", (width, img_height), color=bg_color)
-    draw = ImageDraw.Draw(img)
-
-    # Draw main rounded rectangle with enhanced styling
-    rect_radius = 32
+    # Main rounded rectangle
     margin = 16
     rect_x0, rect_y0 = margin, margin
     rect_x1, rect_y1 = width - margin, img_height - margin
+    text_x = rect_x0 + padding // 2
+
+    # Title area: top 1/3, with the title block centered in it
+    title = None
+    if has_title and title_lines:
+        title_y = rect_y0 + padding // 2
+        title_center_y = title_y + (title_area_height - title_height) // 2
+        title = TextBlock(title_font_size, title_entry.line_height, title_lines, text_x, title_center_y)
+
+    # Content area: bottom 2/3 with spacing from title
+    content_start_y = rect_y0 + padding // 2 + title_area_height
+    # Add extra space between title and content areas
+    content_spacing = 20  # pixels of space between title and description
+    content_y = content_start_y + content_spacing
+
+    description = None
+    if has_desc and desc_lines:
+        description = TextBlock(desc_font_size, desc_entry.line_height, desc_lines, text_x, content_y)
+        content_y += description.height + 12  # gap after description
+
+    task = TextBlock(task_font_size, task_entry.line_height, task_lines, text_x, content_y)
+
+    observe_stage('layout', started)
+    return LabelLayout(width, img_height, font_path, (rect_x0, rect_y0, rect_x1, rect_y1), title, description, task)
+
+# Layout modes: "standard" starts every label at 2 inches and sizes each field
+# on its own; "compact" sizes the fields together for the shortest label,
+# which saves tape and print time on continuous media
+LAYOUT_MODES = ('standard', 'compact')
+LAYOUT_MODE = os.environ.get('LABEL_LAYOUT_MODE', 'standard')
+
+# Compact mode: (smallest legible, largest) font size of each field, in
+# pixels at 300 DPI
+COMPACT_FONT_SIZES = {"title": (36, 72), "description": (24, 40), "task": (30, 48)}
+COMPACT_MIN_HEIGHT = 300  # 1 inch
+COMPACT_PADDING = 48  # text inset from the left and right label edges
+COMPACT_INSET = 24  # ink inset from the top and bottom of the frame
+COMPACT_GAP = 14  # ink gap between fields
+# Sizes are searched in this many steps between smallest and largest
+COMPACT_STEPS = 16
+
+def word_fit_size(text, max_size, max_width, font_path=FONT_PATH, min_size=WARM_FONT_SIZES[0]):
+    """Largest size up to max_size at which the widest word of text fits max_width.
+
+    min_size when the word is too wide even at that size.
+    """
+    words = text.split()
+    if not words:
+        return max_size
+    font = get_font(max_size, font_path)
+
+    def ink_width(font, word):
+        _, left, right = font.measure_word(word)
+        return right - left
+
+    widest = max(words, key=lambda word: ink_width(font, word))
+    lo, hi, best = min_size, max_size, min_size
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if ink_width(get_font(mid, font_path), widest) <= max_width + WRAP_TOLERANCE:
+            best = mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+def break_long_words(text, font, max_width):
+    """Split every word of text that is wider than max_width into pieces that fit"""
+    def too_wide(word):
+        _, left, right = font.measure_word(word)
+        return right - left > max_width
+
+    words = text.split()
+    if not any(map(too_wide, words)):
+        return text
+    pieces = []
+    for word in words:
+        while font.line_width(word) > max_width:
+            # Longest prefix that fits, and always at least one character
+            lo, hi, cut = 2, len(word) - 1, 1
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                if font.line_width(word[:mid]) <= max_width:
+                    cut = mid
+                    lo = mid + 1
+                else:
+                    hi = mid - 1
+            pieces.append(word[:cut])
+            word = word[cut:]
+        pieces.append(word)
+    return ' '.join(pieces)
+
+def wrap_lines_breaking_words(text, size, max_width, font_path=FONT_PATH):
+    """wrap_lines, except that words wider than max_width are broken across lines"""
+    key = (font_path, size, max_width, text, 'break')
+    lines = wrap_cache.get(key)
+    if lines is None:
+        font = get_font(size, font_path)
+        lines = wrap_text(break_long_words(text, font, max_width), font, max_width)
+        wrap_cache.put(key, lines)
+    return lines
+
+def layout_compact_label(text, width, font_path, label_title, label_description):
+    """Lay out the shortest label that keeps every field legible.
+
+    The label is as long as its fields need at their smallest legible sizes,
+    and never shorter than COMPACT_MIN_HEIGHT. All fields then grow together,
+    in COMPACT_STEPS steps toward their largest sizes, for as long as they
+    still fit that length. No field grows past the size at which its widest
+    word fits the label. A word too wide even at the smallest size, such as a
+    URL, is broken across lines rather than shrinking the field.
+    """
+    started = time.perf_counter()
+    margin = 16
+    text_width = width - 2 * COMPACT_PADDING
+    fields = []
+    for name, value in (("title", label_title), ("description", label_description), ("task", text)):
+        if name != "task" and not (value and value.strip()):
+            continue
+        lo, hi = COMPACT_FONT_SIZES[name]
+        fields.append((name, value, lo, word_fit_size(value, hi, text_width, font_path, min_size=lo)))
+
+    def blocks_at(step):
+        blocks = []
+        for name, value, lo, hi in fields:
+            size = lo + (hi - lo) * step // COMPACT_STEPS
+            blocks.append((name, size, wrap_lines_breaking_words(value, size, text_width, font_path)))
+        return blocks
+
+    def height_of(blocks):
+        filled = [get_font(size, font_path).line_height * len(lines) for _, size, lines in blocks if lines]
+        return 2 * (margin + COMPACT_INSET) + sum(filled) + COMPACT_GAP * max(0, len(filled) - 1)
+
+    # Bisect for the largest step that keeps the shortest length
+    target = max(COMPACT_MIN_HEIGHT, height_of(blocks_at(0)))
+    best, lo, hi = 0, 1, COMPACT_STEPS
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if height_of(blocks_at(mid)) <= target:
+            best = mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    blocks = blocks_at(best)
+    started = observe_stage('sizing', started)
+
+    # Stack the fields ink to ink, centered when the label has room to spare
+    ink_top = margin + COMPACT_INSET + (target - height_of(blocks)) // 2
+    text_x = (width - text_width) // 2
+    placed = {}
+    for name, size, lines in blocks:
+        font = get_font(size, font_path)
+        # Text is drawn from the ascender line, above the glyphs' ink
+        offset = font.font.getbbox('Ay')[1]
+        placed[name] = TextBlock(size, font.line_height, lines, text_x, ink_top - offset)
+        if lines:
+            ink_top += font.line_height * len(lines) + COMPACT_GAP
+
+    observe_stage('layout', started)
+    rect = (margin, margin, width - margin, target - margin)
+    return LabelLayout(width, target, font_path, rect, placed.get("title"), placed.get("description"), placed["task"])
+
+# Computed layouts, keyed by the same content hash as rendered labels and
+# bounded by the memory they hold (about 1.2 KiB for a short label)
+LAYOUT_CACHE_MAX_BYTES = 4 * 1024 * 1024
+layout_cache = LRUCache(LAYOUT_CACHE_MAX_BYTES, sizeof=lambda layout: layout.nbytes)
+
+def layout_key(
+    text,
+    width=696,
+    font_path=FONT_PATH,
+    font_size=42,
+    padding=60,
+    label_title="To-Do",
+    label_description="Your task for today",
+    layout_mode="standard"
+):
+    """Cache key of layout_label's result, the same whichever defaults the caller spelled out"""
+    return label_key(
+        text, label_title, label_description,
+        width=width, font_path=font_path, font_size=font_size, padding=padding, layout_mode=layout_mode
+    )
+
+def get_label_layout(text, **layout_params):
+    """layout_label, memoized in layout_cache"""
+    key = layout_key(text, **layout_params)
+    layout = layout_cache.get(key)
+    if layout is None:
+        layout = layout_label(text, **layout_params)
+        layout_cache.put(key, layout)
+    return layout
+
+def draw_label(
+    layout,
+    bg_color="#f8f9fa",
+    item_color="#ffffff",
+    border_color="#ff0000",
+    render_mode="rgb"
+):
+    """Rasterize a LabelLayout"""
+    started = time.perf_counter()
+    width, img_height = layout.width, layout.height
+
+    palette = render_mode == "palette"
+    title_color = "#cc0000"  # Slightly darker red for better contrast
+    desc_color = "#333333"  # Darker gray for better readability
+    task_color = "#000000"  # Pure black for task text
+
+    if palette:
+        # Draw straight into the white/black/red palette of two-color media,
+        # without anti-aliasing, so conversion only has to split planes
+        img = Image.new("P", (width, img_height), color=PALETTE_WHITE)
+        img.putpalette(LABEL_PALETTE)
+        draw = ImageDraw.Draw(img)
+        draw.fontmode = "1"
+        item_color = PALETTE_WHITE
+        border_color = title_color = PALETTE_RED
+        desc_color = task_color = PALETTE_BLACK
+    else:
+        # Create image with subtle gradient background
+        img = Image.new("RGB", (width, img_height), color=bg_color)
+        draw = ImageDraw.Draw(img)
+
+    # Draw main rounded rectangle with enhanced styling
+    rect_radius = 32
+    rect_x0, rect_y0, rect_x1, rect_y1 = layout.rect
 
     # Draw shadow effect
     shadow_offset = 4
-    shadow_color = (0, 0, 0, 30)  # Semi-transparent black
     shadow_rect = [rect_x0 + shadow_offset, rect_y0 + shadow_offset, rect_x1 + shadow_offset, rect_y1 + shadow_offset]
     # Note: PIL doesn't support alpha in RGB mode, so we'll use a solid shadow color
     shadow_color_solid = (240, 240, 240)  # Light gray shadow
-    draw.rounded_rectangle(shadow_rect, radius=rect_radius, fill=shadow_color_solid)
+    if not palette:
+        # The shadow would only turn into dither speckle on two-color media
+        draw.rounded_rectangle(shadow_rect, radius=rect_radius, fill=shadow_color_solid)
 
     # Draw main rectangle
     draw.rounded_rectangle(
@@ -895,56 +1766,116 @@ def create_todo_image(
     inner_rect = [rect_x0 + inner_margin, rect_y0 + inner_margin, rect_x1 - inner_margin, rect_y1 - inner_margin]
     draw.rounded_rectangle(inner_rect, radius=rect_radius - 8, outline=border_color, width=1)
 
-    # Visual separator between title and content areas removed for cleaner look
-
-    # Draw sections in proportional layout with wrapped text
-    # Title area: top 1/3
-    if has_title and title_lines:
-        title_y = rect_y0 + padding // 2
-        # Center title block in its area
-        title_block_height = title_height
-        title_center_y = title_y + (title_area_height - title_block_height) // 2
-
-        # Draw title lines
-        current_y = title_center_y
-        for line in title_lines:
-            draw.text(
-                (rect_x0 + padding // 2, current_y),
-                line,
-                font=font_title,
-                fill="#cc0000"  # Slightly darker red for better contrast
-            )
-            current_y += font_title.getbbox('Ay')[3] - font_title.getbbox('Ay')[1]
+    # Draw the title, description and task lines where the layout put them
+    for block, fill in ((layout.title, title_color), (layout.description, desc_color), (layout.task, task_color)):
+        if block is None:
+            continue
+        font = get_font(block.font_size, layout.font_path).font
+        for line, y in zip(block.lines, block.ys):
+            draw.text((block.x, y), line, font=font, fill=fill)
 
-    # Content area: bottom 2/3 with spacing from title
-    content_start_y = rect_y0 + padding // 2 + title_area_height
-    # Add extra space between title and content areas
-    content_spacing = 20  # pixels of space between title and description
-    content_y = content_start_y + content_spacing
+    observe_stage('drawing', started)
+    return img
 
-    if has_desc and desc_lines:
-        # Draw description lines
-        for line in desc_lines:
-            draw.text(
-                (rect_x0 + padding // 2, content_y),
-                line,
-                font=font_desc,
-                fill="#333333"  # Darker gray for better readability
-            )
-            content_y += font_desc.getbbox('Ay')[3] - font_desc.getbbox('Ay')[1]
-        content_y += 12  # gap after description
-
-    # Draw task lines
-    for line in task_lines:
-        draw.text(
-            (rect_x0 + padding // 2, content_y),
-            line,
-            font=font_task,
-            fill="#000000"  # Pure black for task text
-        )
-        content_y += line_height
+def create_todo_image(
+    text,
+    width=696,
+    font_path=FONT_PATH,
+    font_size=42,
+    padding=60,
+    bg_color="#f8f9fa",
+    item_color="#ffffff",
+    border_color="#ff0000",
+    text_color="#000000",
+    label_title="To-Do",
+    label_description="Your task for today",
+    render_mode="rgb",
+    layout_mode="standard"
+):
+    layout = get_label_layout(
+        text,
+        label_title=label_title,
+        label_description=label_description,
+        width=width,
+        font_path=font_path,
+        font_size=font_size,
+        padding=padding,
+        layout_mode=layout_mode
+    )
+    return draw_label(layout, bg_color=bg_color, item_color=item_color, border_color=border_color, render_mode=render_mode)
+
+warm_font_cache()
+
+# Rendered label PNGs, keyed by a hash of their content
+LABEL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+LABEL_CACHE_MAX_AGE = 86400
+# Bump when create_todo_image output changes so stale ETags stop matching
+LABEL_RENDER_VERSION = 1
+label_cache = LRUCache(LABEL_CACHE_MAX_BYTES)
+
+def encode_png(img):
+    """Encode a label as PNG; palette labels are written at 2 bits per pixel"""
+    buf = io.BytesIO()
+    if img.mode == 'P':
+        img.save(buf, format='PNG', bits=2)
+    else:
+        img.save(buf, format='PNG')
+    return buf.getvalue()
 
-    return img
+def label_key(task, label_title, label_description, **render_params):
+    """Content hash identifying a rendered label"""
+    payload = json.dumps(
+        [LABEL_RENDER_VERSION, task, label_title, label_description, render_params],
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def page_response(html):
+    """An HTML page with a validator, so an unchanged page revalidates as 304"""
+    response = Response(html, mimetype='text/html')
+    response.set_etag(hashlib.sha256(response.get_data()).hexdigest(), weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.before_request
+def start_printer_monitor():
+    # Only the first request of each (forked) process has anything to start
+    if _printer_monitor_pid != os.getpid():
+        _ensure_printer_monitor()
+
+@app.after_request
+def compress_response(response):
+    """gzip or brotli text responses; streamed responses are left alone"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = preferred_encoding()
+    data = response.get_data()
+    if encoding is None or len(data) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes differ, so a strong validator would be wrong
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+@app.route('/assets/<filename>')
+def static_asset(filename):
+    asset = static_assets.get(filename)
+    if asset is None:
+        return jsonify({"status": "error", "message": "Unknown asset."}), 404
+
+    encoding = preferred_encoding()
+    response = Response(asset.encoded.get(encoding, asset.body), mimetype=asset.mimetype)
+    if encoding in asset.encoded:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(asset.etag, weak=True)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response.make_conditional(request)
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -961,6 +1892,10 @@ def index():
         task = request.form['task']
         label_title = request.form['label_title']
         label_description = request.form['label_description']
+        # Start the preview now; the browser asks for it only after the redirect
+        # and the page have loaded
+        if PRERENDER_ENABLED and task:
+            prerender_label(task, label_title, label_description)
         # Redirect to GET with query params to prevent form resubmission warning
         return redirect(f'/?{urlencode({"task": task, "label_title": label_title, "label_description": label_description})}')
 
@@ -969,13 +1904,13 @@ def index():
         params = urlencode({"task": task, "label_title": label_title, "label_description": label_description})
         image_url = f"/label.png?{params}"
 
-    return render_template_string(
-        HTML,
+    return page_response(render_template(
+        INDEX_TEMPLATE,
         image_url=image_url,
         task=task,
         label_title=label_title,
         label_description=label_description
-    )
+    ))
 
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
@@ -985,15 +1920,1040 @@ def settings():
     if request.method == 'POST':
         settings_data['printer_ip'] = request.form['printer_ip']
         settings_data['printer_model'] = request.form['printer_model']
+        settings_data['printers'] = parse_printer_list(request.form.get('printers', ''))
+        dispatch = request.form.get('printer_dispatch')
+        settings_data['printer_dispatch'] = dispatch if dispatch in PRINTER_DISPATCH_MODES else 'least_busy'
         save_settings(settings_data)
         saved = True
 
-    return render_template_string(
-        SETTINGS_HTML,
+    return page_response(render_template(
+        SETTINGS_TEMPLATE,
         printer_ip=settings_data['printer_ip'],
         printer_model=settings_data['printer_model'],
+        printers=format_printer_list(settings_data.get('printers')),
+        printer_dispatch=settings_data.get('printer_dispatch') or 'least_busy',
+        dispatch_modes=PRINTER_DISPATCH_MODES,
+        pool_size=len(printer_pool(settings_data)),
         saved=saved
+    ))
+
+# Media and brother_ql conversion options used for every print
+LABEL_MEDIA = '62'
+CONVERT_OPTIONS = {
+    'rotate': 'auto',  # or 0, 90, 180, 270
+    'threshold': 70.0,  # Adjust if needed
+    'dither': True,
+    'compress': True,
+    'red': True,  # For two-color printers
+    'dpi_600': False,
+    'hq': True,
+    'cut': True
+}
+
+# Conversion engine used when a print doesn't ask for one
+CONVERT_ENGINES = ('brother_ql', 'numpy')
+CONVERT_ENGINE = os.environ.get('LABEL_CONVERT_ENGINE', 'brother_ql')
+
+# Finished raster instructions, so reprints skip rendering and conversion
+RASTER_CACHE_MAX_BYTES = 16 * 1024 * 1024
+raster_cache = LRUCache(RASTER_CACHE_MAX_BYTES)
+
+def raster_key(labels, printer_model, media=LABEL_MEDIA):
+    """Hash identifying the raster instructions for labels on a printer model and media"""
+    payload = json.dumps(
+        [[label_key(*label, render_mode=RENDER_MODE, layout_mode=LAYOUT_MODE) for label in labels], printer_model, media, CONVERT_OPTIONS],
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def is_palette_label(img):
+    """True for images drawn by create_todo_image in palette mode"""
+    return img.mode == 'P' and img.getpalette()[:len(LABEL_PALETTE)] == LABEL_PALETTE
+
+def palette_planes(img, pixel_width, offset):
+    """Split a palette label into device-width black and red 1-bit planes"""
+    indices = Image.frombytes('L', img.size, img.tobytes())
+    planes = []
+    for index in (PALETTE_BLACK, PALETTE_RED):
+        lut = [255 if i == index else 0 for i in range(256)]
+        plane = Image.new('1', (pixel_width, img.size[1]), 0)
+        plane.paste(indices.point(lut, mode='1'), (offset, 0))
+        planes.append(plane)
+    return planes
+
+def build_raster(printer_model, pages, media=LABEL_MEDIA):
+    """Wrap raster pages in the command sequence brother_ql's convert() emits
+    for endless red/black media.
+
+    pages is a list of (image, add_raster) pairs; add_raster(qlr, pixel_width,
+    offset) appends the page's raster lines to qlr. Emitting the same commands
+    keeps the alternative conversion paths byte-identical to convert().
+    """
+    from brother_ql import BrotherQLUnsupportedCmd
+    from brother_ql.devicedependent import label_type_specs, right_margin_addition
+    from brother_ql.raster import BrotherQLRaster
+
+    label_specs = label_type_specs[media]
+    qlr = BrotherQLRaster(printer_model)
+    qlr.exception_on_warning = True
+    if not qlr.two_color_support:
+        raise BrotherQLUnsupportedCmd('Printing in red is not supported with the selected model.')
+    pixel_width = qlr.get_pixel_width()
+    right_margin = label_specs['right_margin_dots'] + right_margin_addition.get(qlr.model, 0)
+    cut = CONVERT_OPTIONS['cut']
+
+    try:
+        qlr.add_switch_mode()
+    except BrotherQLUnsupportedCmd:
+        pass
+    qlr.add_invalidate()
+    qlr.add_initialize()
+    try:
+        qlr.add_switch_mode()
+    except BrotherQLUnsupportedCmd:
+        pass
+
+    for img, add_raster in pages:
+        qlr.add_status_information()
+        qlr.mtype = 0x0A
+        qlr.mwidth = label_specs['tape_size'][0]
+        qlr.mlength = 0
+        qlr.pquality = int(CONVERT_OPTIONS['hq'])
+        qlr.add_media_and_quality(img.size[1])
+        try:
+            if cut:
+                qlr.add_autocut(True)
+                qlr.add_cut_every(1)
+        except BrotherQLUnsupportedCmd:
+            pass
+        try:
+            qlr.dpi_600 = CONVERT_OPTIONS['dpi_600']
+            qlr.cut_at_end = cut
+            qlr.two_color_printing = True
+            qlr.add_expanded_mode()
+        except BrotherQLUnsupportedCmd:
+            pass
+        qlr.add_margins(label_specs['feed_margin'])
+        try:
+            if CONVERT_OPTIONS['compress']:
+                qlr.add_compression(True)
+        except BrotherQLUnsupportedCmd:
+            pass
+        add_raster(qlr, pixel_width, pixel_width - img.size[0] - right_margin)
+        qlr.add_print()
+
+    return qlr.data
+
+def convert_palette_labels(images, printer_model, media=LABEL_MEDIA):
+    """Build raster instructions for palette labels without threshold or dither"""
+    def add_raster(img):
+        def add(qlr, pixel_width, offset):
+            qlr.add_raster_data(*palette_planes(img, pixel_width, offset))
+        return add
+
+    return build_raster(printer_model, [(img, add_raster(img)) for img in images], media)
+
+def numpy_planes(img, pixel_width, offset):
+    """Black and red print planes of a label as device-width boolean arrays.
+
+    Mirrors convert(red=True): hue, saturation, value and luma come from
+    Pillow's own HSV and L conversions, so the masks match it exactly.
+    """
+    import numpy as np
+
+    if is_palette_label(img):
+        indices = np.asarray(Image.frombytes('L', img.size, img.tobytes()))
+        black = indices == PALETTE_BLACK
+        red = indices == PALETTE_RED
+    else:
+        if img.mode.endswith('A'):
+            # place in front of white background and get rid of transparency
+            bg = Image.new("RGB", img.size, (255, 255, 255))
+            bg.paste(img, img.split()[-1])
+            img = bg
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        hsv = np.asarray(img.convert('HSV'))
+        h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+        # convert() keeps a pixel when its inverted luma reaches the threshold
+        threshold = min(255, max(0, int((100.0 - CONVERT_OPTIONS['threshold']) / 100.0 * 255)))
+        inked = 255 - np.asarray(img.convert('L')).astype(np.int16) >= threshold
+        red = ((h < 40) | (h > 210)) & (s > 100) & (v > 80) & inked
+        black = (v < 80) & inked & ~red
+
+    planes = []
+    for plane in (black, red):
+        full = np.zeros((img.size[1], pixel_width), dtype=bool)
+        full[:, offset:offset + img.size[0]] = plane
+        planes.append(full)
+    return planes
+
+def numpy_raster_lines(black, red, compress):
+    """Interleaved black/red raster lines, as add_raster_data would write them"""
+    import numpy as np
+    import packbits
+
+    # The printer expects each row mirrored and packed MSB-first
+    planes = (
+        (b'\x77\x01', np.packbits(black[:, ::-1], axis=1)),
+        (b'\x77\x02', np.packbits(red[:, ::-1], axis=1)),
+    )
+
+    # Labels repeat the same rows many times, so encode each distinct row once
+    encoded = {}
+    lines = []
+    for prefix, rows in planes:
+        plane_lines = []
+        for row in rows:
+            raw = prefix + row.tobytes()
+            line = encoded.get(raw)
+            if line is None:
+                data = packbits.encode(raw[2:]) if compress else raw[2:]
+                line = encoded[raw] = prefix + bytes([len(data)]) + data
+            plane_lines.append(line)
+        lines.append(plane_lines)
+    return b''.join(black_line + red_line for black_line, red_line in zip(*lines))
+
+def convert_labels_numpy(images, printer_model, media=LABEL_MEDIA):
+    """Vectorized conversion for 62mm red/black media, byte-identical to convert()"""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        raise RuntimeError("The numpy conversion engine needs numpy installed")
+
+    if not CONVERT_OPTIONS['red'] or media != '62':
+        raise RuntimeError("The numpy conversion engine only supports 62mm red/black media")
+
+    def add_raster(img):
+        def add(qlr, pixel_width, offset):
+            black, red = numpy_planes(img, pixel_width, offset)
+            qlr.data += numpy_raster_lines(black, red, qlr._compression)
+        return add
+
+    rotate = CONVERT_OPTIONS['rotate']
+    pages = []
+    for img in images:
+        if rotate not in ('auto', 0):
+            img = img.rotate(int(rotate), expand=True)
+        if img.size[0] != 696:
+            img = img.resize((696, int((696 / img.size[0]) * img.size[1])), Image.LANCZOS)
+        pages.append((img, add_raster(img)))
+    return build_raster(printer_model, pages, media)
+
+def convert_labels(images, printer_model, engine=None, media=LABEL_MEDIA):
+    """Convert rendered labels to one Brother QL raster instruction stream.
+
+    All images share a single invalidate/initialize preamble and the printer
+    cuts after each label. engine picks "brother_ql" (its convert()) or the
+    vectorized "numpy" engine; both produce the same bytes.
+    """
+    engine = engine or CONVERT_ENGINE
+    if engine not in CONVERT_ENGINES:
+        raise ValueError(f"Unknown conversion engine: {engine}")
+    if engine == 'numpy':
+        return convert_labels_numpy(images, printer_model, media)
+
+    if all(is_palette_label(img) for img in images) and CONVERT_OPTIONS['red'] and media == '62':
+        return convert_palette_labels(images, printer_model, media)
+
+    from brother_ql.conversion import convert
+    from brother_ql.raster import BrotherQLRaster
+
+    # Create the raster object
+    qlr = BrotherQLRaster(printer_model)
+    qlr.exception_on_warning = True
+
+    # Convert the image to printer instructions
+    return convert(qlr=qlr, images=images, label=media, **CONVERT_OPTIONS)
+
+_brother_ql_import_lock = threading.Lock()
+
+def preload_brother_ql():
+    """Finish importing brother_ql before background threads use it.
+
+    Its package __init__ imports its own submodules circularly, which can hand
+    a half-initialized module to a thread importing it at the same time.
+    """
+    with _brother_ql_import_lock:
+        import brother_ql.backends.helpers  # noqa: F401
+        import brother_ql.conversion  # noqa: F401
+        import brother_ql.reader  # noqa: F401
+
+# Serialize connections to each printer between print workers and imports, and
+# (through a lock file) between server worker processes. Different printers
+# are sent to in parallel.
+_printer_locks = {}
+_printer_locks_lock = threading.Lock()
+
+def printer_file(printer_ip, suffix):
+    """Path of a per-printer file shared between worker processes"""
+    return os.path.join(PRINT_JOB_DIR, 'printer-' + re.sub(r'[^0-9A-Za-z.-]', '_', printer_ip) + suffix)
+
+@contextlib.contextmanager
+def printer_connection_lock(printer_ip, blocking=True):
+    """Hold the process-wide and cross-process lock for one printer.
+
+    Yields True once the lock is held. With blocking=False it yields False
+    straight away if the printer is already in use.
+    """
+    with _printer_locks_lock:
+        lock = _printer_locks.setdefault(printer_ip, threading.Lock())
+    if not lock.acquire(blocking):
+        yield False
+        return
+    try:
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(PRINT_JOB_DIR, exist_ok=True)
+        with open(printer_file(printer_ip, '.lock'), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        lock.release()
+
+def printer_in_use(printer_ip):
+    """True if this or another worker process is sending to the printer right now"""
+    with printer_connection_lock(printer_ip, blocking=False) as acquired:
+        return not acquired
+
+def send_to_printer(instructions, printer_ip):
+    """Send raster instructions to a network printer and wait for it"""
+    from brother_ql.backends.helpers import send
+
+    with printer_connection_lock(printer_ip):
+        send(
+            instructions=instructions,
+            printer_identifier=f"tcp://{printer_ip}",
+            backend_identifier="network",
+            blocking=True
+        )
+
+# Print jobs are handled by a background worker so requests never wait on the printer
+PRINT_QUEUE_SIZE = 100
+PRINT_JOB_HISTORY = 500
+# Job status is also written here so any server worker process can answer /jobs
+PRINT_JOB_DIR = os.environ.get('LABEL_JOB_DIR', os.path.join(tempfile.gettempdir(), 'brother_ql_todo_jobs'))
+PRINT_JOB_TTL = 3600
+
+# Most labels accepted by a single /print/batch request
+PRINT_BATCH_MAX = 200
+
+# Printer pool: the configured printer_ip/printer_model comes first and
+# settings["printers"] adds more, each a {"ip", "model", "media"} dict. Each job
+# goes to the least busy printer or the next in turn, and a printer that can't
+# be reached is skipped for PRINTER_RETRY_AFTER seconds. The turn is shared by
+# all worker processes through PRINT_JOB_DIR, so they don't all start on the
+# first printer.
+PRINTER_DISPATCH_MODES = ('least_busy', 'round_robin')
+PRINTER_RETRY_AFTER = 30.0
+
+def printer_pool(settings):
+    """The configured printers as {"ip", "model", "media"} dicts, without duplicates"""
+    entries = [{'ip': settings.get('printer_ip'), 'model': settings.get('printer_model')}]
+    entries.extend(settings.get('printers') or [])
+    printers = []
+    seen = set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        ip = str(entry.get('ip') or '').strip()
+        model = str(entry.get('model') or '').strip()
+        if not ip or not model or ip in seen:
+            continue
+        seen.add(ip)
+        printers.append({'ip': ip, 'model': model, 'media': str(entry.get('media') or LABEL_MEDIA).strip()})
+    return printers
+
+def parse_printer_list(text):
+    """Printers from the settings form, one "IP model [media]" per line"""
+    printers = []
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) < 2:
+            continue
+        printers.append({'ip': fields[0], 'model': fields[1], 'media': fields[2] if len(fields) > 2 else LABEL_MEDIA})
+    return printers
+
+def format_printer_list(printers):
+    return "\n".join(f"{p.get('ip', '')} {p.get('model', '')} {p.get('media') or LABEL_MEDIA}" for p in printers or [])
+
+class PrinterDispatcher:
+    """Chooses the printer for each job and tracks which are busy or unreachable"""
+
+    def __init__(self):
+        self._active = {}  # ip -> jobs of this process currently using the printer
+        self._down_until = {}  # ip -> time.monotonic() before which it is skipped
+        # Turn counter where there is no fcntl, and so no forked workers to share it with
+        self._turn = 0
+        self._lock = threading.Lock()
+
+    def next_turn(self):
+        """A counter shared by every worker process, one step per job"""
+        if fcntl is not None:
+            try:
+                os.makedirs(PRINT_JOB_DIR, exist_ok=True)
+                with open(os.path.join(PRINT_JOB_DIR, 'dispatch-turn'), 'a+') as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    f.seek(0)
+                    text = f.read().strip()
+                    turn = int(text) if text.isdigit() else 0
+                    f.seek(0)
+                    f.truncate()
+                    f.write(str(turn + 1))
+                    return turn
+            except OSError:
+                pass
+        with self._lock:
+            self._turn += 1
+            return self._turn
+
+    def order(self, printers, mode='least_busy'):
+        """Printers to try for one job, best first; unreachable ones go last.
+
+        Least busy counts this process's jobs on each printer, and a printer
+        another process is sending to as busy too. Ties, and every job in
+        round robin mode, go to the printers in turn.
+        """
+        start = self.next_turn() % len(printers)
+        ordered = printers[start:] + printers[:start]
+        if mode != 'round_robin':
+            in_use = {p['ip']: printer_in_use(p['ip']) for p in ordered}
+            with self._lock:
+                load = {ip: max(self._active.get(ip, 0), int(busy)) for ip, busy in in_use.items()}
+            ordered.sort(key=lambda p: load[p['ip']])
+        with self._lock:
+            now = time.monotonic()
+            down = {p['ip'] for p in ordered if self._down_until.get(p['ip'], 0) > now}
+        down.update(p['ip'] for p in ordered if not printer_accepts_jobs(get_printer_status(p['ip'])))
+        return sorted(ordered, key=lambda p: p['ip'] in down)
+
+    @contextlib.contextmanager
+    def using(self, printer):
+        with self._lock:
+            self._active[printer['ip']] = self._active.get(printer['ip'], 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[printer['ip']] -= 1
+
+    def mark_down(self, printer):
+        with self._lock:
+            self._down_until[printer['ip']] = time.monotonic() + PRINTER_RETRY_AFTER
+
+    def mark_up(self, printer):
+        with self._lock:
+            self._down_until.pop(printer['ip'], None)
+
+printer_dispatcher = PrinterDispatcher()
+
+# Printer status is probed in the background with the QL status request
+# (ESC i S) and shared between worker processes through PRINT_JOB_DIR, so
+# /print can turn jobs away at once instead of waiting on a TCP timeout
+PRINTER_STATUS_INTERVAL = float(os.environ.get('LABEL_PRINTER_STATUS_INTERVAL', '10'))
+PRINTER_STATUS_TTL = 30.0
+PRINTER_PROBE_TIMEOUT = 2.0
+# A probe holds the printer's lock, which print jobs wait on, so it waits only
+# briefly for the reply; printers that answer at all answer within a few ms
+PRINTER_REPLY_TIMEOUT = 0.5
+# Invalidate, initialize, then request a 32-byte status reply
+PRINTER_STATUS_REQUEST = b'\x00' * 200 + b'\x1b\x40' + b'\x1b\x69\x53'
+
+_printer_status = {}  # ip -> latest status dict
+_printer_status_lock = threading.Lock()
+_printer_monitor = None
+_printer_monitor_pid = None  # process that started _printer_monitor
+
+def printer_address(printer_ip):
+    """(host, port) for an "ip" or "ip:port" printer address"""
+    host, _, port = printer_ip.partition(':')
+    return host, int(port) if port else 9100
+
+def offline_status(error=None):
+    """A status dict for a printer that couldn't be reached"""
+    return {
+        "online": False,
+        "media_type": None,
+        "media_width": None,
+        "errors": [],
+        "cover_open": False,
+        "error": error,
+        "checked_at": time.time()
+    }
+
+def probe_printer(printer_ip):
+    """Ask a printer for its status.
+
+    Returns a dict with online, media_type, media_width (mm), errors,
+    cover_open, error (why the status couldn't be read) and checked_at.
+    """
+    from brother_ql.reader import interpret_response
+
+    status = offline_status()
+    data = b''
+    try:
+        with socket.create_connection(printer_address(printer_ip), timeout=PRINTER_PROBE_TIMEOUT) as sock:
+            status["online"] = True
+            sock.settimeout(PRINTER_REPLY_TIMEOUT)
+            sock.sendall(PRINTER_STATUS_REQUEST)
+            while len(data) < 32:
+                chunk = sock.recv(32 - len(data))
+                if not chunk:
+                    break
+                data += chunk
+    except OSError as e:
+        if not status["online"]:
+            status["error"] = f"Unreachable: {e}"
+            return status
+    try:
+        reply = interpret_response(data)
+    except NameError:
+        # Reachable, but this printer doesn't answer status requests over the network
+        status["error"] = "No status reply"
+        return status
+    status["media_type"] = reply['media_type']
+    status["media_width"] = reply['media_width']
+    status["errors"] = reply['errors']
+    status["cover_open"] = any('Cover opened' in error for error in reply['errors'])
+    return status
+
+def printer_accepts_jobs(status):
+    """False only when a known status says the printer can't print; unknown is fine"""
+    return status is None or (status["online"] and not status["errors"])
+
+def _read_shared_status(printer_ip):
+    try:
+        with open(printer_file(printer_ip, '.status.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def set_printer_status(printer_ip, status):
+    """Record a status in this process and for the other worker processes"""
+    with _printer_status_lock:
+        _printer_status[printer_ip] = status
+    try:
+        os.makedirs(PRINT_JOB_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.status.', dir=PRINT_JOB_DIR)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(status, f)
+        os.replace(tmp_path, printer_file(printer_ip, '.status.json'))
+    except OSError as e:
+        print(f"Error saving printer status for {printer_ip}: {e}")
+
+def get_printer_status(printer_ip):
+    """Latest status of a printer, or None when unknown or older than PRINTER_STATUS_TTL"""
+    with _printer_status_lock:
+        status = _printer_status.get(printer_ip)
+    # A printer this process saw fail may have come back since another process
+    # probed it, so look at the shared status for those too
+    if status is None or time.time() - status["checked_at"] > PRINTER_STATUS_INTERVAL or not printer_accepts_jobs(status):
+        shared = _read_shared_status(printer_ip)
+        if shared is not None and (status is None or shared["checked_at"] > status["checked_at"]):
+            status = shared
+            with _printer_status_lock:
+                _printer_status[printer_ip] = status
+    if status is None or time.time() - status["checked_at"] > PRINTER_STATUS_TTL:
+        return None
+    return status
+
+def refresh_printer_status(printer_ip, recheck_failed=False):
+    """Probe a printer unless another process just did; returns its status.
+
+    With recheck_failed, a printer whose last status can't take jobs is
+    probed again however recent that status is.
+    """
+    status = get_printer_status(printer_ip)
+    fresh = status is not None and time.time() - status["checked_at"] < PRINTER_STATUS_INTERVAL
+    if fresh and not (recheck_failed and not printer_accepts_jobs(status)):
+        return status
+    with printer_connection_lock(printer_ip, blocking=False) as acquired:
+        if not acquired:
+            # A job is being sent, which says more than a probe could
+            return status
+        status = probe_printer(printer_ip)
+    set_printer_status(printer_ip, status)
+    return status
+
+def _printer_monitor_loop():
+    while True:
+        try:
+            for printer in printer_pool(load_settings()):
+                refresh_printer_status(printer['ip'])
+        except Exception as e:
+            print(f"Error checking printer status: {e}")
+        time.sleep(PRINTER_STATUS_INTERVAL)
+
+def _ensure_printer_monitor():
+    # Started lazily, like the print workers, so each server process has one
+    global _printer_monitor, _printer_monitor_pid
+    _printer_monitor_pid = os.getpid()
+    if PRINTER_STATUS_INTERVAL <= 0:
+        return
+    preload_brother_ql()
+    with _printer_status_lock:
+        if _printer_monitor is None or not _printer_monitor.is_alive():
+            _printer_monitor = threading.Thread(target=_printer_monitor_loop, name='printer-monitor', daemon=True)
+            _printer_monitor.start()
+
+def unavailable_printers(printers):
+    """Why each printer that currently can't take a job can't, keyed by IP"""
+    reasons = {}
+    for printer in printers:
+        status = get_printer_status(printer['ip'])
+        if printer_accepts_jobs(status):
+            continue
+        if not status["online"]:
+            reasons[printer['ip']] = status["error"] or "offline"
+        else:
+            reasons[printer['ip']] = ", ".join(status["errors"])
+    return reasons
+
+class PrintJob:
+    """A queued print of one or more labels and the time it spent in each state
+
+    labels is a list of (task, label_title, label_description) tuples; they are
+    converted together and sent over one printer connection. The printer is
+    picked from the pool when the job runs.
+    """
+
+    def __init__(self, labels, settings, engine=None):
+        self.id = uuid.uuid4().hex
+        self.labels = labels
+        self.engine = engine or CONVERT_ENGINE
+        self.printers = printer_pool(settings)
+        self.dispatch = settings.get('printer_dispatch') or 'least_busy'
+        self.printer_ip = None
+        self.state = 'queued'
+        self.error = None
+        self.cached = False
+        self.created_at = time.time()
+        self.timings = {}
+        self._entered = time.perf_counter()
+        # The request thread saves the job after queueing it, which can race
+        # the print worker's saves; the file must end with the latest state
+        self._save_lock = threading.Lock()
+
+    def set_state(self, state, error=None):
+        now = time.perf_counter()
+        self.timings[self.state] = round(now - self._entered, 4)
+        self._entered = now
+        self.state = state
+        self.error = error
+        self.save()
+
+    def save(self):
+        """Write the job status to PRINT_JOB_DIR for other worker processes"""
+        try:
+            os.makedirs(PRINT_JOB_DIR, exist_ok=True)
+            with self._save_lock:
+                fd, tmp_path = tempfile.mkstemp(prefix='.job.', dir=PRINT_JOB_DIR)
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.to_dict(), f)
+                os.replace(tmp_path, os.path.join(PRINT_JOB_DIR, self.id + '.json'))
+        except OSError as e:
+            print(f"Error saving print job {self.id}: {e}")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "error": self.error,
+            "labels": len(self.labels),
+            "cached": self.cached,
+            "engine": self.engine,
+            "printer": self.printer_ip,
+            "created_at": self.created_at,
+            "timings": dict(self.timings)
+        }
+
+    def instructions_for(self, printer):
+        """Raster instructions for the job's labels on one printer, from raster_cache if possible"""
+        key = raster_key(self.labels, printer['model'], printer['media'])
+        instructions = raster_cache.get(key)
+        self.cached = instructions is not None
+        if instructions is None:
+            self.set_state('rendering')
+            images = [
+                create_todo_image(
+                    task,
+                    label_title=label_title,
+                    label_description=label_description,
+                    render_mode=RENDER_MODE,
+                    layout_mode=LAYOUT_MODE
+                )
+                for task, label_title, label_description in self.labels
+            ]
+            started = time.perf_counter()
+            instructions = convert_labels(images, printer['model'], self.engine, printer['media'])
+            observe_stage('convert', started)
+            raster_cache.put(key, instructions)
+        return instructions
+
+    def run(self):
+        error = "No printer configured"
+        try:
+            for printer in printer_dispatcher.order(self.printers, self.dispatch):
+                with printer_dispatcher.using(printer):
+                    self.printer_ip = printer['ip']
+                    instructions = self.instructions_for(printer)
+                    self.set_state('sending')
+                    started = time.perf_counter()
+                    try:
+                        send_to_printer(instructions, printer['ip'])
+                    except OSError as e:
+                        # Unreachable: skip this printer for a while and fail over
+                        printer_dispatcher.mark_down(printer)
+                        set_printer_status(printer['ip'], offline_status(f"Unreachable: {e}"))
+                        print_failovers_total.inc(label_value=printer['ip'])
+                        error = f"{printer['ip']}: {e}"
+                        continue
+                    observe_stage('send', started)
+                    printer_dispatcher.mark_up(printer)
+                printer_bytes_total.inc(len(instructions))
+                labels_printed_total.inc(len(self.labels))
+                self.set_state('done')
+                print_jobs_total.inc(label_value='done')
+                return
+            self.set_state('failed', f"Print failed: {error}")
+        except Exception as e:
+            self.set_state('failed', f"Print failed: {str(e)}")
+        print_jobs_total.inc(label_value='failed')
+
+print_queue = queue.Queue(maxsize=PRINT_QUEUE_SIZE)
+print_jobs = OrderedDict()
+_print_jobs_lock = threading.Lock()
+_print_workers = []
+_job_files_pruned = 0.0
+
+def _print_worker_loop():
+    while True:
+        job = print_queue.get()
+        try:
+            job.run()
+        finally:
+            print_queue.task_done()
+
+def _ensure_print_workers(count):
+    # Started lazily so a pre-forking server gets workers in each child. One
+    # worker per printer keeps every printer in the pool busy.
+    preload_brother_ql()
+    with _print_jobs_lock:
+        _print_workers[:] = [worker for worker in _print_workers if worker.is_alive()]
+        while len(_print_workers) < count:
+            worker = threading.Thread(target=_print_worker_loop, name=f'print-worker-{len(_print_workers)}', daemon=True)
+            worker.start()
+            _print_workers.append(worker)
+
+def _prune_job_files():
+    # At most once a minute, drop status files older than PRINT_JOB_TTL and
+    # labels rendered ahead more than PRERENDER_TTL ago
+    global _job_files_pruned
+    now = time.time()
+    if now - _job_files_pruned < 60:
+        return
+    _job_files_pruned = now
+    try:
+        for name in os.listdir(PRINT_JOB_DIR):
+            path = os.path.join(PRINT_JOB_DIR, name)
+            if name.startswith('prerender-'):
+                ttl = PRERENDER_TTL
+            elif name.endswith('.json'):
+                ttl = PRINT_JOB_TTL
+            else:
+                continue
+            if now - os.path.getmtime(path) > ttl:
+                os.unlink(path)
+    except OSError:
+        pass
+
+def submit_print_job(job):
+    """Queue a job for the print workers; False if the queue is full"""
+    _ensure_print_workers(max(1, len(job.printers)))
+    _prune_job_files()
+    with _print_jobs_lock:
+        print_jobs[job.id] = job
+        while len(print_jobs) > PRINT_JOB_HISTORY:
+            print_jobs.popitem(last=False)
+    try:
+        print_queue.put_nowait(job)
+    except queue.Full:
+        with _print_jobs_lock:
+            print_jobs.pop(job.id, None)
+        return False
+    job.save()
+    return True
+
+def get_print_job(job_id):
+    """Status dict of a job from this process or from another worker's status file"""
+    with _print_jobs_lock:
+        job = print_jobs.get(job_id)
+    if job is not None:
+        return job.to_dict()
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return None
+    try:
+        with open(os.path.join(PRINT_JOB_DIR, job_id + '.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# Bulk import streams rows through parse -> render -> convert -> send, holding
+# at most IMPORT_CHUNK_SIZE rendered labels at a time
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_CHUNK_SIZE = 10
+
+def detect_import_format(filename='', content_type=''):
+    """Guess csv or jsonl from a filename or content type, defaulting to csv"""
+    filename = (filename or '').lower()
+    content_type = (content_type or '').lower()
+    if filename.endswith(('.jsonl', '.ndjson', '.json')) or 'json' in content_type:
+        return 'jsonl'
+    return 'csv'
+
+def parse_import_rows(stream, fmt):
+    """Yield (row number, label, error) for each row of a CSV or JSON Lines text stream.
+
+    label is a (task, label_title, label_description) tuple, or None when the
+    row is invalid and error says why. CSV files need a header with a task
+    column; label_title and label_description are optional.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        entries = ((reader.line_num, row, None) for row in reader)
+    else:
+        def json_entries():
+            for number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line), None
+                except ValueError as e:
+                    yield number, None, f"Invalid JSON: {e}"
+        entries = json_entries()
+
+    for number, entry, error in entries:
+        if error:
+            yield number, None, error
+            continue
+        if not isinstance(entry, dict):
+            yield number, None, "Expected an object with a task"
+            continue
+        task = entry.get('task')
+        if task is not None and not isinstance(task, str):
+            yield number, None, "The task is not text"
+            continue
+        if not task or not task.strip():
+            yield number, None, "Missing task"
+            continue
+        label_title = entry.get('label_title')
+        label_description = entry.get('label_description')
+        if not isinstance(label_title, (str, type(None))) or not isinstance(label_description, (str, type(None))):
+            yield number, None, "The title or description is not text"
+            continue
+        yield number, (task, label_title or '', label_description or ''), None
+
+def import_labels(rows, printer_ip, printer_model, engine=None, send=True):
+    """Render, convert and send parsed rows a chunk at a time.
+
+    Yields one progress event per row, in row order: {"row", "status":
+    "ok"|"error", "message"}. With send=False labels are converted but not
+    printed.
+    """
+    # (row number, rendered image or None, error), printed a chunk at a time
+    chunk = []
+    for number, label, error in rows:
+        img = None
+        if not error:
+            try:
+                task, label_title, label_description = label
+                img = create_todo_image(
+                    task,
+                    label_title=label_title,
+                    label_description=label_description,
+                    render_mode=RENDER_MODE,
+                    layout_mode=LAYOUT_MODE
+                )
+            except Exception as e:
+                error = f"Render failed: {str(e)}"
+        chunk.append((number, img, error))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            yield from _print_import_chunk(chunk, printer_ip, printer_model, engine, send)
+            chunk = []
+    if chunk:
+        yield from _print_import_chunk(chunk, printer_ip, printer_model, engine, send)
+
+def _print_import_chunk(chunk, printer_ip, printer_model, engine, send):
+    images = [img for _, img, error in chunk if not error]
+    failure = None
+    if images:
+        try:
+            started = time.perf_counter()
+            instructions = convert_labels(images, printer_model, engine)
+            observe_stage('convert', started)
+            if send:
+                started = time.perf_counter()
+                send_to_printer(instructions, printer_ip)
+                observe_stage('send', started)
+                printer_bytes_total.inc(len(instructions))
+                labels_printed_total.inc(len(images))
+        except Exception as e:
+            failure = f"Print failed: {str(e)}"
+    for number, _, error in chunk:
+        error = error or failure
+        if error:
+            yield {"row": number, "status": "error", "message": error}
+        else:
+            yield {"row": number, "status": "ok", "message": "Printed" if send else "Converted"}
+
+# Render-ahead: POST / starts rendering the preview before it redirects, so
+# the /label.png request that follows finds it done. Worker processes share
+# these renders through PRINT_JOB_DIR for PRERENDER_TTL seconds, since the
+# image request often lands on a different process than the form submit.
+PRERENDER_ENABLED = os.environ.get('LABEL_PRERENDER', '1') != '0'
+PRERENDER_TTL = 60
+# Longest a /label.png request waits for a render that is already under way
+PRERENDER_WAIT = 2.0
+PRERENDER_QUEUE_SIZE = 16
+prerender_queue = queue.Queue(maxsize=PRERENDER_QUEUE_SIZE)
+_prerenders = {}  # key -> Event set once the render is done
+_prerender_lock = threading.Lock()
+_prerender_worker = None
+
+def prerender_file(key, suffix='.png'):
+    """Shared file of a label rendered ahead; '.rendering' marks one under way"""
+    return os.path.join(PRINT_JOB_DIR, f'prerender-{key}{suffix}')
+
+def _file_age(path):
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return None
+
+def render_label_png(key, task, label_title, label_description):
+    """Render and encode a label preview and keep it in label_cache"""
+    img = create_todo_image(
+        task,
+        label_title=label_title,
+        label_description=label_description,
+        render_mode=RENDER_MODE,
+        layout_mode=LAYOUT_MODE
     )
+    started = time.perf_counter()
+    png = encode_png(img)
+    observe_stage('png_encode', started)
+    label_cache.put(key, png)
+    return png
+
+def _prerender_worker_loop():
+    while True:
+        key, fields = prerender_queue.get()
+        try:
+            png = render_label_png(key, *fields)
+            os.makedirs(PRINT_JOB_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.prerender.', dir=PRINT_JOB_DIR)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, prerender_file(key))
+        except Exception as e:
+            print(f"Error rendering label ahead: {e}")
+        finally:
+            _finish_prerender(key)
+            prerender_queue.task_done()
+
+def _finish_prerender(key):
+    with _prerender_lock:
+        done = _prerenders.pop(key, None)
+    if done is not None:
+        done.set()
+    with contextlib.suppress(OSError):
+        os.unlink(prerender_file(key, '.rendering'))
+
+def _ensure_prerender_worker():
+    # Started lazily, like the print workers, so each server process has one
+    global _prerender_worker
+    with _prerender_lock:
+        if _prerender_worker is None or not _prerender_worker.is_alive():
+            _prerender_worker = threading.Thread(target=_prerender_worker_loop, name='prerender-worker', daemon=True)
+            _prerender_worker.start()
+
+def prerender_label(task, label_title, label_description):
+    """Queue a preview render unless it is cached, under way or the queue is full"""
+    key = label_key(task, label_title, label_description, render_mode=RENDER_MODE, layout_mode=LAYOUT_MODE)
+    age = _file_age(prerender_file(key))
+    if key in label_cache or (age is not None and age < PRERENDER_TTL):
+        return
+    with _prerender_lock:
+        if key in _prerenders:
+            return
+        _prerenders[key] = threading.Event()
+    _ensure_prerender_worker()
+    _prune_job_files()
+    try:
+        os.makedirs(PRINT_JOB_DIR, exist_ok=True)
+        open(prerender_file(key, '.rendering'), 'w').close()
+        prerender_queue.put_nowait((key, (task, label_title, label_description)))
+    except (OSError, queue.Full):
+        # The image request renders it instead
+        _finish_prerender(key)
+        prerenders_total.inc(label_value='skipped')
+        return
+    prerenders_total.inc(label_value='started')
+
+def prerendered_png(key):
+    """A label rendered ahead by this or another process, or None.
+
+    Waits up to PRERENDER_WAIT for a render that is under way, which is
+    never slower than starting a second one.
+    """
+    with _prerender_lock:
+        pending = _prerenders.get(key)
+    if pending is not None:
+        pending.wait(PRERENDER_WAIT)
+        if key in label_cache:
+            return label_cache.get(key)
+
+    path = prerender_file(key)
+    deadline = time.monotonic() + PRERENDER_WAIT
+    while True:
+        age = _file_age(path)
+        if age is not None and age < PRERENDER_TTL:
+            try:
+                with open(path, 'rb') as f:
+                    return f.read()
+            except OSError:
+                pass
+        marker_age = _file_age(prerender_file(key, '.rendering'))
+        if marker_age is None or marker_age > PRERENDER_WAIT or time.monotonic() >= deadline:
+            return None
+        time.sleep(0.01)
+
+def label_response(response, key):
+    """Attach the validators for a content-addressed label"""
+    response.set_etag(key)
+    response.headers['Cache-Control'] = f'public, max-age={LABEL_CACHE_MAX_AGE}'
+    return response
+
+@app.route('/label/layout')
+def label_layout():
+    task = request.args.get('task', '')
+    label_title = request.args.get('label_title', '')
+    label_description = request.args.get('label_description', '')
+    layout_mode = request.args.get('layout') or LAYOUT_MODE
+    if layout_mode not in LAYOUT_MODES:
+        return jsonify({"status": "error", "message": f"Unknown layout mode. Use one of: {', '.join(LAYOUT_MODES)}."}), 400
+
+    layout = get_label_layout(task, label_title=label_title, label_description=label_description, layout_mode=layout_mode)
+    return jsonify(layout.to_dict())
 
 @app.route('/label.png')
 def label_png():
@@ -1001,16 +2961,21 @@ def label_png():
     label_title = request.args.get('label_title', '')
     label_description = request.args.get('label_description', '')
 
+    # The key is known before rendering, so revalidation never renders
+    key = label_key(task, label_title, label_description, render_mode=RENDER_MODE, layout_mode=LAYOUT_MODE)
+    if request.if_none_match.contains(key):
+        return label_response(Response(status=304), key)
+
     try:
-        img = create_todo_image(
-            task,
-            label_title=label_title,
-            label_description=label_description
-        )
-        buf = io.BytesIO()
-        img.save(buf, format='PNG')
-        buf.seek(0)
-        return send_file(buf, mimetype='image/png')
+        png = label_cache.get(key)
+        if png is None and PRERENDER_ENABLED:
+            png = prerendered_png(key)
+            if png is not None:
+                prerenders_total.inc(label_value='used')
+                label_cache.put(key, png)
+        if png is None:
+            png = render_label_png(key, task, label_title, label_description)
+        return label_response(Response(png, mimetype='image/png'), key)
     except Exception as e:
         # Return a simple error image
         error_img = Image.new('RGB', (400, 200), color='red')
@@ -1028,55 +2993,137 @@ def print_label():
         label_title = request.form.get('label_title', '')
         label_description = request.form.get('label_description', '')
 
-        # Load and validate printer settings
-        settings_data = load_settings()
-        if not settings_data.get('printer_ip', '').strip():
-            return jsonify({"status": "error", "message": "Printer not configured. Please go to Settings to configure your printer."}), 400
-
-        if not settings_data.get('printer_model', '').strip():
-            return jsonify({"status": "error", "message": "Printer model not configured. Please go to Settings to configure your printer."}), 400
+        engine = request.form.get('engine') or None
 
-        img = create_todo_image(
-            task,
-            label_title=label_title,
-            label_description=label_description
-        )
-        img.save("label_to_print.png")
-
-        # Add your brother_ql print code here if desired
-        from brother_ql.backends.helpers import send
-        from brother_ql.conversion import convert
-        from brother_ql.raster import BrotherQLRaster
-
-        # Create the raster object
-        qlr = BrotherQLRaster(settings_data['printer_model'])
-        qlr.exception_on_warning = True
-
-        # Convert the image to printer instructions
-        instructions = convert(
-            qlr=qlr,
-            images=["label_to_print.png"],
-            label='62',
-            rotate='auto',  # or 0, 90, 180, 270
-            threshold=70.0,  # Adjust if needed
-            dither=True,
-            compress=True,
-            red=True,  # For two-color printers
-            dpi_600=False,
-            hq=True,
-            cut=True
-        )
+        return queue_print([(task, label_title, label_description)], "Your label has been queued for printing.", engine)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Print failed: {str(e)}"}), 500
 
-        # Send to printer using configured IP
-        send(
-            instructions=instructions,
-            printer_identifier=f"tcp://{settings_data['printer_ip']}",
-            backend_identifier="network",
-            blocking=True
-        )
-        return jsonify({"status": "ok", "message": "Your label has been sent to the printer."})
+@app.route('/print/batch', methods=['POST'])
+def print_batch():
+    try:
+        payload = request.get_json(silent=True)
+        entries = payload.get('labels') if isinstance(payload, dict) else payload
+        if not isinstance(entries, list) or not entries:
+            return jsonify({"status": "error", "message": "Expected a JSON list of labels."}), 400
+        if len(entries) > PRINT_BATCH_MAX:
+            return jsonify({"status": "error", "message": f"A batch can contain at most {PRINT_BATCH_MAX} labels."}), 400
+
+        labels = []
+        for i, entry in enumerate(entries):
+            task = entry.get('task', '') if isinstance(entry, dict) else ''
+            if not isinstance(task, str) or not task.strip():
+                return jsonify({"status": "error", "message": f"Label {i} has no task."}), 400
+            label_title = entry.get('label_title') or ''
+            label_description = entry.get('label_description') or ''
+            if not isinstance(label_title, str) or not isinstance(label_description, str):
+                return jsonify({"status": "error", "message": f"Label {i} has a title or description that is not text."}), 400
+            labels.append((task, label_title, label_description))
+
+        engine = payload.get('engine') if isinstance(payload, dict) else None
+        return queue_print(labels, f"{len(labels)} labels have been queued for printing.", engine)
     except Exception as e:
         return jsonify({"status": "error", "message": f"Print failed: {str(e)}"}), 500
 
+@app.route('/import', methods=['POST'])
+def import_route():
+    """Print every row of an uploaded CSV or JSON Lines file, streaming NDJSON progress"""
+    settings_data = load_settings()
+    if not settings_data.get('printer_ip', '').strip() or not settings_data.get('printer_model', '').strip():
+        return jsonify({"status": "error", "message": "Printer not configured. Please go to Settings to configure your printer."}), 400
+
+    engine = request.args.get('engine') or None
+    if engine is not None and engine not in CONVERT_ENGINES:
+        return jsonify({"status": "error", "message": f"Unknown conversion engine. Use one of: {', '.join(CONVERT_ENGINES)}."}), 400
+
+    unavailable = unavailable_printers([{'ip': settings_data['printer_ip']}])
+    if unavailable:
+        return printers_unavailable_response(unavailable)
+
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({"status": "error", "message": "Upload the file as a form field named 'file'."}), 400
+        # Large uploads are spooled to disk by Werkzeug, so this stays streaming
+        raw, filename = upload.stream, upload.filename
+    else:
+        # Any other body is the file itself. Reading request.form or
+        # request.files here would parse a form-encoded body (curl's default
+        # for --data-binary) and use it up.
+        if request.content_length == 0:
+            return jsonify({"status": "error", "message": "The request has no file to import."}), 400
+        raw, filename = request.stream, ''
+    fmt = request.args.get('format') or detect_import_format(filename, request.content_type)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"status": "error", "message": f"Unknown import format. Use one of: {', '.join(IMPORT_FORMATS)}."}), 400
+
+    # The import converts and sends from this request thread while the print
+    # worker may be doing the same
+    preload_brother_ql()
+
+    def generate():
+        stream = io.TextIOWrapper(raw, encoding='utf-8', errors='replace', newline='')
+        counts = {"ok": 0, "error": 0}
+        rows = parse_import_rows(stream, fmt)
+        for event in import_labels(rows, settings_data['printer_ip'], settings_data['printer_model'], engine):
+            counts[event['status']] += 1
+            yield json.dumps(event) + "\n"
+        if not counts["ok"] and not counts["error"]:
+            # The 200 is already sent, so say so in the last line instead
+            yield json.dumps({"status": "error", "message": "The file has no rows to import."}) + "\n"
+            return
+        yield json.dumps({"status": "done", "printed": counts["ok"], "failed": counts["error"]}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def printers_unavailable_response(unavailable):
+    details = "; ".join(f"{ip}: {reason}" for ip, reason in unavailable.items())
+    return jsonify({"status": "error", "message": f"Printer unavailable ({details}).", "printers": unavailable}), 503
+
+def queue_print(labels, message, engine=None):
+    """Validate printer settings and queue labels as one print job"""
+    if engine is not None and engine not in CONVERT_ENGINES:
+        return jsonify({"status": "error", "message": f"Unknown conversion engine. Use one of: {', '.join(CONVERT_ENGINES)}."}), 400
+
+    # Load and validate printer settings
+    settings_data = load_settings()
+    if not settings_data.get('printer_ip', '').strip():
+        return jsonify({"status": "error", "message": "Printer not configured. Please go to Settings to configure your printer."}), 400
+
+    if not settings_data.get('printer_model', '').strip():
+        return jsonify({"status": "error", "message": "Printer model not configured. Please go to Settings to configure your printer."}), 400
+
+    # Fail fast when every printer is known to be offline or in an error state
+    printers = printer_pool(settings_data)
+    unavailable = unavailable_printers(printers)
+    if printers and len(unavailable) == len(printers):
+        return printers_unavailable_response(unavailable)
+
+    job = PrintJob(labels, settings_data, engine)
+    if not submit_print_job(job):
+        return jsonify({"status": "error", "message": "The print queue is full. Please try again shortly."}), 503
+    return jsonify({"status": "ok", "job_id": job.id, "message": message}), 202
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/printer/status')
+def printer_status():
+    """Cached status of every configured printer; ?refresh=1 probes stale and failing ones now"""
+    refresh = request.args.get('refresh') == '1'
+    printers = []
+    for printer in printer_pool(load_settings()):
+        status = refresh_printer_status(printer['ip'], recheck_failed=True) if refresh else get_printer_status(printer['ip'])
+        printers.append(dict(printer, status=status, accepting=printer_accepts_jobs(status)))
+    return jsonify({"status": "ok", "printers": printers})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_print_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown print job."}), 404
+    return jsonify(job)
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
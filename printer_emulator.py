@@ -0,0 +1,391 @@
+"""Emulate a Brother QL network printer for offline end-to-end tests.
+
+Listens like a QL printer on TCP 9100 and parses the raster stream that
+BrotherQLRaster produces: invalidate, initialize, mode and media commands,
+compressed or plain raster lines and print/cut. Status requests (ESC i S) are
+answered with a 32-byte status reply. Each page is "printed" at a
+configurable speed, and jobs can be made to fail. Throughput is reported on
+stderr, and received pages can be decoded back to PNGs for checks.
+
+Point the app at it with printer IP 127.0.0.1:9100 (or the --port you pick).
+
+    python printer_emulator.py                          # 0.0.0.0:9100, ~110 mm/s
+    python printer_emulator.py --port 9101 --speed 0    # print instantly
+    python printer_emulator.py --fail-rate 0.2          # drop 1 in 5 jobs
+    python printer_emulator.py --error cover_open       # report an open cover
+    python printer_emulator.py --save-dir received/     # decode pages to PNG
+"""
+import argparse
+import os
+import random
+import socketserver
+import sys
+import threading
+import time
+
+import packbits
+from PIL import Image
+
+# Fixed-length ESC commands: prefix -> total length including the prefix
+ESC_COMMANDS = {
+    b'\x1b@': 2,  # initialize
+    b'\x1biS': 3,  # status request
+    b'\x1bia': 4,  # switch mode
+    b'\x1bi!': 4,  # automatic status notification
+    b'\x1biz': 13,  # media and quality
+    b'\x1biM': 4,  # various mode (auto cut)
+    b'\x1biA': 4,  # cut every n labels
+    b'\x1biK': 4,  # expanded mode (two-color, cut at end)
+    b'\x1bid': 5,  # margins
+    b'\x1biUJ': 18,  # job ID
+    b'\x1biUw\x01': 132,  # additional media information
+    b'\x1biXG': 4,  # request config
+}
+
+# Status reply fields (see the QL raster command reference)
+STATUS_REPLY, STATUS_PRINTING_COMPLETED, STATUS_ERROR = 0x00, 0x01, 0x02
+PHASE_WAITING, PHASE_PRINTING = 0x00, 0x01
+MEDIA_CONTINUOUS = 0x0A
+
+# Error states the emulator can report: name -> (error byte 1, error byte 2)
+PRINTER_ERRORS = {
+    'none': (0x00, 0x00),
+    'no_media': (0x01, 0x00),
+    'cutter_jam': (0x04, 0x00),
+    'cover_open': (0x00, 0x10),
+}
+
+# Vertical resolution used to turn raster rows into printed length
+PRINTER_DPI = 300
+
+class ProtocolError(Exception):
+    """The byte stream isn't a valid QL raster job"""
+
+class RasterParser:
+    """Incremental parser for one connection's raster stream.
+
+    feed() takes bytes as they arrive and returns the events they complete:
+    ("status", None) for a status request and ("page", page) for each printed
+    page, where page is a dict of its settings and black/red raster rows.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.offset = 0  # stream position of the start of _buf
+        self.compression = False
+        self.two_color = False
+        self.cut = False
+        self.media_width = None
+        self.raster_no = None
+        self.row_bytes = None
+        self.black = []
+        self.red = []
+
+    def feed(self, data):
+        self._buf += data
+        buf = self._buf
+        events = []
+        i = 0
+        while i < len(buf):
+            byte = buf[i]
+            if byte == 0x00:  # invalidate
+                i += 1
+            elif byte in (0x67, 0x77):  # raster line: g 0x00 n data / w color n data
+                if i + 3 > len(buf) or i + 3 + buf[i + 2] > len(buf):
+                    break
+                end = i + 3 + buf[i + 2]
+                self._raster_line(buf[i + 1] if byte == 0x77 else 0x01, bytes(buf[i + 3:end]))
+                i = end
+            elif byte == 0x5A:  # blank raster line
+                self._raster_line(0x01, None)
+                if self.two_color:
+                    self._raster_line(0x02, None)
+                i += 1
+            elif byte == 0x4D:  # compression mode
+                if i + 2 > len(buf):
+                    break
+                self.compression = buf[i + 1] == 0x02
+                i += 2
+            elif byte in (0x0C, 0x1A):  # print page / print last page
+                events.append(('page', self._finish_page()))
+                i += 1
+            elif byte == 0x1B:
+                consumed = self._esc_command(buf, i, events)
+                if consumed is None:
+                    break
+                i += consumed
+            else:
+                raise ProtocolError(f"Unknown command byte 0x{byte:02x} at offset {self.offset + i}")
+        del buf[:i]
+        self.offset += i
+        return events
+
+    def _esc_command(self, buf, i, events):
+        """Handle the ESC command at i; returns its length or None if incomplete"""
+        available = bytes(buf[i:i + 5])
+        for prefix, length in ESC_COMMANDS.items():
+            if not available.startswith(prefix):
+                if len(available) < len(prefix) and prefix.startswith(available):
+                    return None
+                continue
+            if i + length > len(buf):
+                return None
+            args = buf[i + len(prefix):i + length]
+            if prefix == b'\x1b@':
+                self.black, self.red = [], []
+            elif prefix == b'\x1biS':
+                events.append(('status', None))
+            elif prefix == b'\x1biz':
+                self.media_width = args[2]
+                self.raster_no = int.from_bytes(args[4:8], 'little')
+            elif prefix == b'\x1biM':
+                self.cut = bool(args[0] & 0x40)
+            elif prefix == b'\x1biK':
+                self.two_color = bool(args[0] & 0x01)
+            return length
+        raise ProtocolError(f"Unknown ESC command {available.hex(' ')} at offset {self.offset + i}")
+
+    def _raster_line(self, color, data):
+        if data is None:
+            row = bytes(self.row_bytes or 90)
+        else:
+            row = packbits.decode(data) if self.compression else data
+        if self.row_bytes is None:
+            self.row_bytes = len(row)
+        elif len(row) != self.row_bytes:
+            raise ProtocolError(f"Raster line of {len(row)} bytes, expected {self.row_bytes}")
+        if color == 0x01:
+            self.black.append(row)
+        elif color == 0x02:
+            self.red.append(row)
+        else:
+            raise ProtocolError(f"Unknown raster color 0x{color:02x}")
+
+    def _finish_page(self):
+        if self.two_color and len(self.red) != len(self.black):
+            raise ProtocolError(f"{len(self.black)} black but {len(self.red)} red raster lines")
+        if self.raster_no is not None and self.raster_no != len(self.black):
+            raise ProtocolError(f"Page announced {self.raster_no} raster lines but sent {len(self.black)}")
+        page = {
+            'rows': len(self.black),
+            'width': (self.row_bytes or 0) * 8,
+            'media_width': self.media_width,
+            'two_color': self.two_color,
+            'cut': self.cut,
+            'black': self.black,
+            'red': self.red,
+        }
+        self.black, self.red = [], []
+        return page
+
+def decode_page(page):
+    """Render a parsed page back to an RGB image as it would come out of the printer"""
+    size = (page['width'], page['rows'])
+    img = Image.new('RGB', size, (255, 255, 255))
+    for color, rows in (((255, 0, 0), page['red']), ((0, 0, 0), page['black'])):
+        if rows:
+            img.paste(color, mask=Image.frombytes('1', size, b''.join(rows)))
+    # Rows are sent mirrored, print head first
+    return img.transpose(Image.FLIP_LEFT_RIGHT)
+
+class EmulatorServer(socketserver.ThreadingTCPServer):
+    # Restarts can rebind the port at once, and open connections don't keep
+    # the process alive
+    allow_reuse_address = True
+    daemon_threads = True
+
+class PrinterEmulator:
+    """A threaded TCP server that behaves like a QL network printer.
+
+    Connections are parsed concurrently, but pages go through a single print
+    head, one at a time, taking rows / PRINTER_DPI inches at speed mm/s
+    (0 prints instantly). fail_rate is the chance a job's connection is
+    dropped part way; error reports a PRINTER_ERRORS state and rejects jobs.
+    Up to keep_pages decoded pages are kept in .pages for checks.
+    """
+
+    def __init__(self, host='0.0.0.0', port=9100, speed=110.0, fail_rate=0.0, error='none',
+                 media_width=62, save_dir=None, keep_pages=0):
+        self.speed = speed
+        self.fail_rate = fail_rate
+        self.error = error
+        self.media_width = media_width
+        self.save_dir = save_dir
+        self.keep_pages = keep_pages
+        self.pages = []
+        self.printing = False
+        self._connections = 0
+        self._stats = {'jobs': 0, 'failed_jobs': 0, 'rejected_jobs': 0, 'protocol_errors': 0,
+                       'status_requests': 0, 'pages': 0, 'rows': 0, 'bytes': 0, 'busy_seconds': 0.0}
+        self._head = threading.Lock()
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._thread = None
+
+        emulator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                emulator.handle_connection(self.request)
+
+        self.server = EmulatorServer((host, port), Handler)
+        self.address = self.server.server_address
+
+    def start(self):
+        """Serve in a background thread; returns self"""
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self.server.serve_forever, name='printer-emulator', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def busy(self):
+        """True while a connection is open, for example a job still printing"""
+        with self._lock:
+            return self._connections > 0
+
+    def _count(self, **amounts):
+        with self._lock:
+            for key, amount in amounts.items():
+                self._stats[key] += amount
+
+    def stats(self):
+        """Counters so far plus pages per minute and bytes per second"""
+        with self._lock:
+            stats = dict(self._stats)
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['pages_per_minute'] = round(stats['pages'] * 60 / elapsed, 1)
+        stats['bytes_per_second'] = round(stats['bytes'] / elapsed)
+        stats['busy_seconds'] = round(stats['busy_seconds'], 3)
+        return stats
+
+    def status_reply(self, status_type=STATUS_REPLY):
+        """The 32-byte reply to a status request"""
+        error_1, error_2 = PRINTER_ERRORS[self.error]
+        reply = bytearray(32)
+        reply[0:4] = b'\x80\x20\x42\x34'  # print head mark, size, fixed 'B', series '4'
+        reply[8] = error_1
+        reply[9] = error_2
+        no_media = self.error == 'no_media'
+        reply[10] = 0 if no_media else self.media_width
+        reply[11] = 0 if no_media else MEDIA_CONTINUOUS
+        reply[18] = STATUS_ERROR if self.error != 'none' else status_type
+        reply[19] = PHASE_PRINTING if self.printing else PHASE_WAITING
+        return bytes(reply)
+
+    def reply(self, sock, data):
+        # Senders that don't read replies (like brother_ql's network backend)
+        # may already have closed their end; the job still prints
+        try:
+            sock.sendall(data)
+        except OSError:
+            pass
+
+    def handle_connection(self, sock):
+        with self._lock:
+            self._connections += 1
+        try:
+            self._handle_connection(sock)
+        finally:
+            with self._lock:
+                self._connections -= 1
+
+    def _handle_connection(self, sock):
+        parser = RasterParser()
+        fail_after = None
+        if self.fail_rate and random.random() < self.fail_rate:
+            # Drop the connection after a random part of the job has arrived
+            fail_after = random.randint(0, 64 * 1024)
+        received = 0
+        pages = 0
+        try:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                received += len(data)
+                self._count(bytes=len(data))
+                if fail_after is not None and received > fail_after:
+                    self._count(jobs=1, failed_jobs=1)
+                    return
+                for event, page in parser.feed(data):
+                    if event == 'status':
+                        self._count(status_requests=1)
+                        self.reply(sock, self.status_reply())
+                    elif self.error != 'none':
+                        self._count(jobs=1, rejected_jobs=1)
+                        self.reply(sock, self.status_reply(STATUS_ERROR))
+                        return
+                    else:
+                        self.print_page(page)
+                        pages += 1
+        except ProtocolError as e:
+            self._count(protocol_errors=1)
+            print(f"Protocol error: {e}", file=sys.stderr)
+            return
+        except OSError:
+            pass
+        if pages:
+            self._count(jobs=1)
+
+    def print_page(self, page):
+        """Hold the print head for as long as the page takes to print"""
+        with self._head:
+            started = time.monotonic()
+            self.printing = True
+            if self.speed > 0:
+                time.sleep(page['rows'] / PRINTER_DPI * 25.4 / self.speed)
+            self.printing = False
+            busy = time.monotonic() - started
+        self._count(pages=1, rows=page['rows'], busy_seconds=busy)
+        if self.save_dir or self.keep_pages:
+            self.keep_page(decode_page(page))
+
+    def keep_page(self, img):
+        with self._lock:
+            number = self._stats['pages']
+            if self.keep_pages:
+                self.pages.append(img)
+                del self.pages[:-self.keep_pages]
+        if self.save_dir:
+            os.makedirs(self.save_dir, exist_ok=True)
+            img.save(os.path.join(self.save_dir, f"page{number:05d}.png"))
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0', help='address to listen on')
+    parser.add_argument('--port', type=int, default=9100, help='TCP port to listen on')
+    parser.add_argument('--speed', type=float, default=110.0, help='print speed in mm/s (0 prints instantly)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of jobs whose connection is dropped')
+    parser.add_argument('--error', choices=sorted(PRINTER_ERRORS), default='none', help='error state to report and reject jobs with')
+    parser.add_argument('--media-width', type=int, default=62, help='loaded media width in mm')
+    parser.add_argument('--save-dir', help='decode received pages to PNGs in this directory')
+    parser.add_argument('--stats-interval', type=float, default=10.0, help='seconds between throughput reports (0 for none)')
+    args = parser.parse_args(argv)
+
+    emulator = PrinterEmulator(args.host, args.port, args.speed, args.fail_rate, args.error,
+                               args.media_width, args.save_dir).start()
+    print(f"Emulating a QL printer on {args.host}:{args.port}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(args.stats_interval or 3600)
+            if args.stats_interval:
+                print(format_stats(emulator.stats()), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    emulator.stop()
+    print(format_stats(emulator.stats()), file=sys.stderr)
+    return 0
+
+def format_stats(stats):
+    return (f"{stats['pages']} pages in {stats['jobs']} jobs ({stats['failed_jobs']} dropped, "
+            f"{stats['rejected_jobs']} rejected, {stats['protocol_errors']} protocol errors), "
+            f"{stats['pages_per_minute']} pages/min, {stats['bytes_per_second'] / 1024:.1f} KiB/s, "
+            f"head busy {stats['busy_seconds']:.1f}s of {stats['elapsed_seconds']:.1f}s")
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
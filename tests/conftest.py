@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# main.py loads its font and settings relative to the working directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+@pytest.fixture
+def reference_convert():
+    """brother_ql's own convert() with the app's options, the output every engine must match"""
+    import main
+    from brother_ql.conversion import convert
+    from brother_ql.raster import BrotherQLRaster
+
+    def run(images, printer_model, media=main.LABEL_MEDIA):
+        qlr = BrotherQLRaster(printer_model)
+        qlr.exception_on_warning = True
+        return convert(qlr=qlr, images=images, label=media, **main.CONVERT_OPTIONS)
+    return run
@@ -0,0 +1,46 @@
+"""The numpy conversion engine must produce exactly convert()'s raster"""
+import random
+
+import pytest
+from PIL import Image
+
+import main
+
+LABELS = [
+    ("Buy milk", "To-Do", "Your task for today"),
+    ("Call the application support team about the renewal " * 3, "Application review", "application form"),
+    ("Réserver la salle — 会議室を予約する", "", ""),
+    ("Pneumonoultramicroscopicsilicovolcanoconiosis" * 2, "Errands", ""),
+]
+
+def noise_image(mode, size, seed):
+    rng = random.Random(seed)
+    bands = len(mode)
+    img = Image.new(mode, size)
+    img.putdata([tuple(rng.randrange(256) for _ in range(bands)) if bands > 1 else rng.randrange(256)
+                 for _ in range(size[0] * size[1])])
+    return img
+
+@pytest.mark.parametrize("printer_model", ["QL-820NWB", "QL-810W"])
+@pytest.mark.parametrize("render_mode,layout_mode", [("rgb", "standard"), ("rgb", "compact"), ("palette", "standard")])
+def test_numpy_engine_matches_convert_on_labels(reference_convert, printer_model, render_mode, layout_mode):
+    images = [
+        main.create_todo_image(task, label_title=title, label_description=description, render_mode=render_mode, layout_mode=layout_mode)
+        for task, title, description in LABELS
+    ]
+    assert main.convert_labels(images, printer_model, "numpy") == reference_convert(images, printer_model)
+
+@pytest.mark.parametrize("mode,size", [
+    ("RGB", (696, 120)),
+    ("RGB", (400, 90)),  # scaled up to the 696-dot head
+    ("RGB", (1000, 150)),  # scaled down
+    ("RGBA", (696, 80)),
+    ("L", (696, 60)),
+])
+def test_numpy_engine_matches_convert_on_noise(reference_convert, monkeypatch, mode, size):
+    # convert() resizes with Image.ANTIALIAS, which Pillow 10 removed; it was
+    # an alias of LANCZOS, which the numpy engine uses
+    monkeypatch.setattr(Image, "ANTIALIAS", Image.LANCZOS, raising=False)
+    # Random colors hit every branch of the red and black masks
+    img = noise_image(mode, size, seed=size[0] * size[1])
+    assert main.convert_labels([img], "QL-820NWB", "numpy") == reference_convert([img], "QL-820NWB")
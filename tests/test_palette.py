@@ -0,0 +1,25 @@
+"""Palette labels skip convert(), but must produce the raster it would"""
+import pytest
+
+import main
+
+LABELS = [
+    ("Buy milk", "To-Do", "Your task for today"),
+    ("Call the application support team about the renewal " * 3, "Application review", "application form"),
+    ("Réserver la salle — 会議室を予約する", "", ""),
+    ("Pneumonoultramicroscopicsilicovolcanoconiosis" * 2, "Errands", ""),
+]
+
+@pytest.mark.parametrize("printer_model", ["QL-820NWB", "QL-810W"])
+@pytest.mark.parametrize("layout_mode", ["standard", "compact"])
+def test_palette_raster_matches_convert(reference_convert, printer_model, layout_mode):
+    images = [
+        main.create_todo_image(task, label_title=title, label_description=description, render_mode="palette", layout_mode=layout_mode)
+        for task, title, description in LABELS
+    ]
+    assert all(main.is_palette_label(img) for img in images)
+    assert main.convert_labels(images, printer_model, "brother_ql") == reference_convert(images, printer_model)
+
+def test_single_palette_label_matches_convert(reference_convert):
+    img = main.create_todo_image("Water the plants", label_title="", label_description="", render_mode="palette")
+    assert main.convert_labels([img], "QL-820NWB", "brother_ql") == reference_convert([img], "QL-820NWB")
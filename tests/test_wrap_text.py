@@ -0,0 +1,53 @@
+"""wrap_text must break lines exactly where measuring every line would"""
+import pytest
+from PIL import ImageFont
+
+import main
+
+def reference_wrap(text, font, max_width):
+    """The original wrapper: measure each candidate line's bounding box"""
+    words = text.split()
+    lines = []
+    while words:
+        line = ''
+        while words:
+            candidate = f"{line} {words[0]}".strip()
+            bbox = font.getbbox(candidate)
+            if bbox[2] - bbox[0] > max_width:
+                break
+            line = candidate
+            words.pop(0)
+        # A word wider than max_width still gets a line of its own
+        lines.append(line or words.pop(0))
+    return lines
+
+TEXTS = [
+    "",
+    "Buy milk",
+    "Call the supplier about the delayed shipment and update the tracking sheet",
+    "Application application application review for the application form",
+    "AVAWAY To-Do LT. Wa Te Yo AV AV AV WAVE Tyrannosaurus Yggdrasil",
+    "Réserver la salle — 会議室を予約する — Überprüfen ✓ Ñandú café",
+    "Pneumonoultramicroscopicsilicovolcanoconiosis " * 3 + "tail",
+    "a b c d e f g h i j k l m n o p q r s t u v w x y z " * 8,
+    "iiii WWWW mm ,,, ... iiii WWWW mm ,,, ... iiii WWWW mm ,,, ...",
+    "  leading   and   repeated   spaces\tand\ttabs\nand newlines  ",
+    " ".join(f"word{i}" for i in range(200)),
+]
+
+@pytest.mark.parametrize("size", [12, 24, 36, 42, 48, 72, 96])
+@pytest.mark.parametrize("max_width", [120, 300, 576, 600])
+def test_wrap_text_matches_reference(size, max_width):
+    reference_font = ImageFont.truetype(main.FONT_PATH, size)
+    font = main.get_font(size)
+    for text in TEXTS:
+        assert main.wrap_text(text, font, max_width) == reference_wrap(text, reference_font, max_width), text
+
+def test_wrap_text_at_every_width_near_a_break():
+    # Widths within WRAP_TOLERANCE of a line's real width take the slow path
+    text = "AVAWAY To-Do Wa Te Yo"
+    font = main.get_font(42)
+    reference_font = ImageFont.truetype(main.FONT_PATH, 42)
+    full = font.line_width(text)
+    for max_width in range(full - 2 * main.WRAP_TOLERANCE - 2, full + 2 * main.WRAP_TOLERANCE + 3):
+        assert main.wrap_text(text, font, max_width) == reference_wrap(text, reference_font, max_width)